@@ -0,0 +1,122 @@
+# Drawing and sending on two threads with the double-buffered SH1106 driver.
+#
+# Host only, it uses real threads and the emulated panels:
+#   python host/run.py bench/double_buffer.py [--frames N]
+#
+# One thread draws random frames and swap()s each one, another calls show()
+# in a loop, as core 0 and core 1 do on the board. Every ROUND frames the
+# sending thread is stopped and sends once more, then the panel must hold
+# the last swapped frame, which is drawn the same on a display without
+# double buffering for reference. Lines drawn after that swap must not have
+# been sent. Over I2C and SPI at every rotation, the exit code is 1 if any
+# round differs.
+import random
+import sys
+import threading
+
+from machine import I2C, SPI, Pin
+from emulator.panels import SH1106Panel
+
+import sh1106
+
+ROTATIONS = (0, 90, 180, 270)
+ROUND = 25
+
+
+def sh1106_i2c(rotate):
+    i2c = I2C(1, freq=400000)
+    panel = SH1106Panel()
+    i2c.attach(0x3c, panel)
+    return sh1106.SH1106_I2C(128, 64, i2c, rotate=rotate, double_buffered=True), panel
+
+
+def sh1106_spi(rotate):
+    spi = SPI(0, baudrate=10000000)
+    dc, res, cs = Pin(16), Pin(17), Pin(18)
+    panel = SH1106Panel()
+    spi.attach(panel, cs=cs, dc=dc)
+    return sh1106.SH1106_SPI(128, 64, spi, dc, res, cs, rotate=rotate,
+                             double_buffered=True), panel
+
+
+def draw(rng, displays, width, height):
+    # the same random shapes on every display
+    if rng.random() < 0.1:
+        for display in displays:
+            display.fill(0)
+    for _ in range(rng.randint(1, 4)):
+        shape = rng.randrange(3)
+        x = rng.randint(-8, width)
+        y = rng.randint(-8, height)
+        w = rng.randint(1, 40)
+        h = rng.randint(1, 24)
+        color = rng.randrange(2)
+        for display in displays:
+            if shape == 0:
+                display.fill_rect(x, y, w, h, color)
+            elif shape == 1:
+                display.line(x, y, x + w, y + h, color)
+            else:
+                display.text("swap", x, y, color)
+
+
+class Sender:
+    """Calls show() on its own thread until stopped."""
+
+    def __init__(self, display):
+        self.display = display
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            self.display.show()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+def check(make, rotate, frames, seed):
+    display, panel = make(rotate)
+    reference = sh1106.SH1106_I2C(128, 64, I2C(1), rotate=rotate)
+    width, height = (64, 128) if display.rotate90 else (128, 64)
+    rng = random.Random(seed)
+    differs = 0
+    sender = Sender(display)
+    for frame in range(1, frames + 1):
+        draw(rng, (display, reference), width, height)
+        display.swap()
+        if frame % ROUND == 0:
+            # drawn but never swapped, so never sent
+            draw(rng, (display,), width, height)
+            sender.stop()
+            display.show()
+            reference.show(True)
+            differs += panel.image(128) != reference.displaybuf
+            # start the next round from the same frame on both
+            display.fill(0)
+            reference.fill(0)
+            sender = Sender(display)
+    sender.stop()
+    return differs, frames // ROUND
+
+
+def main(argv):
+    frames = 200
+    if "--frames" in argv:
+        frames = int(argv[argv.index("--frames") + 1])
+    # switch threads often, so swap() and show() interleave in many ways
+    sys.setswitchinterval(0.00001)
+    failed = False
+    for name, make in (("sh1106_i2c", sh1106_i2c), ("sh1106_spi", sh1106_spi)):
+        for rotate in ROTATIONS:
+            differs, rounds = check(make, rotate, frames, rotate)
+            print("{:12s} rotate={:3d} {}/{} rounds differ".format(name, rotate, differs, rounds))
+            failed = failed or differs
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,109 @@
+# Frame time of the game with and without the dual-core render pipeline.
+#
+# Host only, it uses real threads for the two cores and the emulated bus:
+#   python host/run.py bench/dual_core.py [--frames N] [--logic-ms MS]
+#
+# The scripted player of bench/frames.py plays on an SH1106 over I2C whose
+# transfers take their wire time in wall-clock time (and release the GIL
+# like the bus hardware frees the CPU). "serial" ticks, draws and shows on
+# one thread, "pipeline" hands every frame to the transmit thread. A panel
+# model checks that the last frame ends up on the glass, the exit code is 1
+# if it does not or if the pipeline did not send every frame.
+#
+# Ticking and drawing is much faster on the host than on the board, so every
+# frame's logic is padded by busy waiting to --logic-ms (default 2ms).
+import sys
+import time as host_time
+
+import utime
+from machine import I2C, Pin
+from emulator.panels import SH1106Panel
+from frames import wants_press
+
+import a_game
+import sh1106
+from pipeline import RenderPipeline
+
+I2C_CLOCK = 400000
+
+
+class WireDelay:
+    """Passes I2C traffic to the panel after its wire time has passed."""
+
+    def __init__(self, i2c, panel):
+        self.i2c = i2c
+        self.panel = panel
+
+    def i2c_write(self, data):
+        host_time.sleep(self.i2c.wire_us(len(data)) / 1000000)
+        self.panel.i2c_write(data)
+
+
+def play(frames, pipelined, logic_ms):
+    i2c = I2C(1, freq=I2C_CLOCK)
+    panel = SH1106Panel()
+    i2c.attach(0x3c, WireDelay(i2c, panel))
+    display = sh1106.SH1106_I2C(128, 64, i2c, retained=True)
+    button_pin = Pin(13, Pin.IN, Pin.PULL_UP)
+    button = a_game.Button(button_pin)
+    game = a_game.Game()
+    pipeline = None
+    target = display
+    if pipelined:
+        pipeline = RenderPipeline(display)
+        pipeline.start()
+        target = pipeline.back
+    render = a_game.Render(target, a_game.RGBLed(Pin(10), Pin(11), Pin(12)))
+
+    logic_s = 0.0
+    started = host_time.perf_counter()
+    for _ in range(frames):
+        utime.advance_us(1000000 // a_game.TICKS_PER_SECOND)
+        button_pin.drive(0 if button_pin.value() and wants_press(game.phase) else 1)
+        logic_started = host_time.perf_counter()
+        game.tick(button)
+        render.draw(game.phase)
+        while host_time.perf_counter() - logic_started < logic_ms / 1000:
+            pass
+        logic_s += host_time.perf_counter() - logic_started
+        if pipeline is not None:
+            # every frame is sent here, a game running at a fixed tick
+            # rate would rather let a newer frame replace a waiting one
+            while pipeline.pending:
+                host_time.sleep(0)
+        target.show()
+    if pipeline is not None:
+        pipeline.stop()
+    elapsed_s = host_time.perf_counter() - started
+    return {
+        "frame_ms": elapsed_s * 1000 / frames,
+        "logic_ms": logic_s * 1000 / frames,
+        "bus_ms": i2c.log.wire_us / 1000 / frames,
+        "sent": pipeline.frames_sent if pipeline else frames,
+        "correct": panel.image(128) == display.displaybuf
+        and (pipeline is None or display.renderbuf == pipeline.back.buffer),
+    }
+
+
+def main(argv):
+    frames = 300
+    logic_ms = 2.0
+    if "--frames" in argv:
+        frames = int(argv[argv.index("--frames") + 1])
+    if "--logic-ms" in argv:
+        logic_ms = float(argv[argv.index("--logic-ms") + 1])
+    utime.use_virtual()
+    # hand the GIL over quickly, the two cores run in parallel on the board
+    sys.setswitchinterval(0.0001)
+    failed = False
+    for name, pipelined in (("serial", False), ("pipeline", True)):
+        result = play(frames, pipelined, logic_ms)
+        print("{:8s} frame={:6.2f}ms logic={:6.2f}ms bus={:6.2f}ms sent={}/{}{}".format(
+            name, result["frame_ms"], result["logic_ms"], result["bus_ms"],
+            result["sent"], frames, "" if result["correct"] else " PANEL DIFFERS"))
+        failed = failed or not result["correct"] or result["sent"] != frames
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,135 @@
+# Heap allocations of the game loop once a game is in progress.
+#
+# Runs on the board with the display on I2C1 (sda=2, scl=3) and the RGB LED
+# on pins 10 to 12, its player comes from bench/frames.py:
+#   mpremote cp bench/frames.py :
+#   mpremote run bench/frame_alloc.py
+# or on the host, on every display driver of bench/frames.py:
+#   python host/run.py bench/frame_alloc.py
+#
+# The scripted player of bench/frames.py plays into InGame, the first
+# WARM_UP ticks of it are not measured, so glyphs and buffers made once
+# are not counted, the rest of the game is. On the board gc.mem_alloc() is
+# read around tick and render and more than BUDGET bytes per call fails.
+# CPython has no gc.mem_alloc(), so on the host the lines of src/ that ran
+# are checked against what MicroPython allocates for
+# (emulator/allocations.py) and new buffers handed to the bus are counted.
+# Any finding fails, the exit code is 1.
+import gc
+import sys
+
+import utime as time
+from machine import Pin
+
+import a_game
+from frames import DRIVERS, wants_press
+from profiler import allocations
+from runtime import LedEffect
+
+WARM_UP = a_game.TICKS_PER_SECOND * 2
+BUDGET = 0
+
+
+class Player:
+    """Presses when frames.wants_press() does, no button needed."""
+
+    def __init__(self, game):
+        self.game = game
+        self.pressed_tick = -1
+
+    def pop_press(self) -> int:
+        if self.pressed_tick == self.game.ticks or not wants_press(self.game.phase):
+            return -1
+        self.pressed_tick = self.game.ticks
+        return time.ticks_us()
+
+    def clear(self) -> None:
+        pass
+
+
+def frames(display, led_effect):
+    """Yields once per measured frame, after playing into InGame.
+
+    The caller measures between next() calls, a frame is a tick, a render
+    and an LED update. It stops before the tick that ends the game.
+    """
+    game = a_game.Game()
+    player = Player(game)
+    render = a_game.Render(display, led_effect)
+    in_game = 0
+    while True:
+        phase = game.phase
+        if isinstance(phase, a_game.InGame):
+            if phase.ticks_left == 0:
+                return
+            in_game += 1
+        measured = in_game > WARM_UP
+        if measured:
+            yield game, render, player
+        else:
+            game.tick(player)
+            render.render(game.phase)
+            led_effect.update()
+        if hasattr(time, "advance_us"):
+            time.advance_us(1000000 // a_game.TICKS_PER_SECOND)
+        else:
+            time.sleep_ms(1000 // a_game.TICKS_PER_SECOND)
+
+
+def held_buffers(value, depth=2):
+    # buffers a driver holds, directly or in lists of them such as writevto
+    # vectors, were allocated before and are not new when sent
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        yield value
+    elif depth and isinstance(value, (list, tuple)):
+        for item in value:
+            yield from held_buffers(item, depth - 1)
+
+
+def board():
+    display = a_game.initialize_display(a_game.initialize_i2c(Pin(2), Pin(3)))
+    led_effect = LedEffect(a_game.RGBLed(Pin(10), Pin(11), Pin(12)))
+    allocations.budget = BUDGET
+    allocations.enabled = True
+    for game, render, player in frames(display, led_effect):
+        allocations.measure("tick", game.tick, player)
+        allocations.measure("render", render.render, game.phase)
+        allocations.measure("led", LedEffect.update, led_effect)
+    allocations.dump()
+    return 1 if allocations.over_budget() else 0
+
+
+def host():
+    from emulator.allocations import Tracer
+
+    failed = False
+    for name, make in DRIVERS:
+        time.use_virtual()
+        display, bus, _ = make()
+        led_effect = LedEffect(a_game.RGBLed(Pin(10), Pin(11), Pin(12)))
+        for value in vars(display).values():
+            for buffer in held_buffers(value):
+                bus.log.note_buffer(buffer)
+        tracer = Tracer()
+        count = 0
+        buffers = 0
+        for game, render, player in frames(display, led_effect):
+            before = bus.log.allocations
+            tracer.start()
+            game.tick(player)
+            render.render(game.phase)
+            led_effect.update()
+            tracer.stop()
+            buffers += bus.log.allocations - before
+            count += 1
+        findings = tracer.findings()
+        print("{:12s} {} frames, {} new bus buffers, {} allocating lines".format(
+            name, count, buffers, len(findings)))
+        for path, line, reasons in findings:
+            print("  {}:{}: {}".format(path, line, ", ".join(reasons)))
+        failed = failed or buffers or findings or not count
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(board() if hasattr(gc, "mem_alloc") else host())
@@ -0,0 +1,198 @@
+# Bus traffic and frame time of the game on every supported display driver.
+#
+# Host only, it needs the recording buses of the emulator:
+#   python host/run.py bench/frames.py [--timing] [--output FILE]
+#
+# A scripted player goes through MainMenu -> CountDown -> InGame -> GameOver
+# and back to the menu on SH1106 and SSD1306 panels over I2C and SPI. Per
+# game phase it reports bytes and transactions per frame, the wire time
+# those would take at several I2C clocks and the Python time spent in tick
+# and render. Panel models check that the glass always shows the frame.
+#
+# The JSON written to bench/frames.json (by default) holds the bus numbers,
+# which are deterministic, so changes to show() show up in review. Python
+# timings vary between runs and are only added with --timing.
+import json
+import sys
+import time as host_time
+
+import utime
+from machine import I2C, SPI, Pin
+
+import a_game
+
+I2C_CLOCKS = (100000, 400000, 1000000)
+PHASES = ("MainMenu", "CountDown", "InGame", "GameOver")
+
+
+# the drivers and panel models are imported by the factories below, so
+# wants_press() can be imported on the board as well (bench/frame_alloc.py)
+
+
+def sh1106_i2c():
+    import sh1106
+    from emulator.panels import SH1106Panel
+
+    i2c = I2C(1, freq=400000)
+    panel = SH1106Panel()
+    i2c.attach(0x3c, panel)
+    return sh1106.SH1106_I2C(128, 64, i2c, retained=True), i2c, panel
+
+
+def sh1106_spi():
+    import sh1106
+    from emulator.panels import SH1106Panel
+
+    spi = SPI(0, baudrate=10000000)
+    dc, res, cs = Pin(16), Pin(17), Pin(18)
+    panel = SH1106Panel()
+    spi.attach(panel, cs=cs, dc=dc)
+    return sh1106.SH1106_SPI(128, 64, spi, dc, res, cs, retained=True), spi, panel
+
+
+def ssd1306_i2c():
+    import ssd1306
+    from emulator.panels import SSD1306Panel
+
+    i2c = I2C(1, freq=400000)
+    panel = SSD1306Panel()
+    i2c.attach(0x3c, panel)
+    return ssd1306.SSD1306_I2C(128, 64, i2c, retained=True), i2c, panel
+
+
+def ssd1306_spi():
+    import ssd1306
+    from emulator.panels import SSD1306Panel
+
+    spi = SPI(0, baudrate=10000000)
+    dc, res, cs = Pin(16), Pin(17), Pin(18)
+    panel = SSD1306Panel()
+    spi.attach(panel, cs=cs, dc=dc)
+    return ssd1306.SSD1306_SPI(128, 64, spi, dc, res, cs, retained=True), spi, panel
+
+
+DRIVERS = (
+    ("sh1106_i2c", sh1106_i2c),
+    ("sh1106_spi", sh1106_spi),
+    ("ssd1306_i2c", ssd1306_i2c),
+    ("ssd1306_spi", ssd1306_spi),
+)
+
+
+def wants_press(phase):
+    # a reasonable player: starts right away, presses close to the walls
+    if isinstance(phase, a_game.MainMenu):
+        return True
+    if isinstance(phase, a_game.InGame):
+        return phase.allowed_to_be_rated() and phase.distance_to_cloest_wall() < 8
+    if isinstance(phase, a_game.GameOver):
+        return phase.ticks_left == 0
+    return False
+
+
+def wire_us(bus, transactions, nbytes):
+    if isinstance(bus, I2C):
+        return {str(hz): (11 * transactions + 9 * nbytes) * 1000000 / hz
+                for hz in I2C_CLOCKS}
+    return {str(bus.baudrate): nbytes * 8 * 1000000 / bus.baudrate}
+
+
+def summarize(bus, frames, transactions, nbytes, allocations, python_us, timing):
+    frames = max(1, frames)
+    result = {
+        "frames": frames,
+        "bytes_per_frame": round(nbytes / frames, 1),
+        "transactions_per_frame": round(transactions / frames, 2),
+        "allocations_per_frame": round(allocations / frames, 2),
+        "wire_ms_per_frame": {clock: round(us / frames / 1000, 3)
+                              for clock, us in wire_us(bus, transactions, nbytes).items()},
+    }
+    if timing:
+        result["python_ms_per_frame"] = round(python_us / frames / 1000, 3)
+    return result
+
+
+def run_driver(make, timing):
+    display, bus, panel = make()
+    init = summarize(bus, 1, bus.log.transactions, bus.log.bytes,
+                     bus.log.allocations, 0, False)
+    del init["frames"]
+    button_pin = Pin(13, Pin.IN, Pin.PULL_UP)
+    button = a_game.Button(button_pin)
+    rgb_led = a_game.RGBLed(Pin(10), Pin(11), Pin(12))
+    game = a_game.Game()
+    render = a_game.Render(display, rgb_led)
+
+    totals = {name: [0, 0, 0, 0, 0] for name in PHASES}
+    seen = []
+    mismatches = 0
+    while True:
+        phase = game.phase
+        name = type(phase).__name__
+        if not seen or seen[-1] != name:
+            if seen and name == PHASES[0]:
+                break
+            seen.append(name)
+        # release between presses, the phases react to the button going down
+        utime.advance_us(1000000 // a_game.TICKS_PER_SECOND)
+        button_pin.drive(0 if button_pin.value() and wants_press(phase) else 1)
+        log = bus.log
+        log.reset()
+        started = host_time.perf_counter()
+        game.tick(button)
+        render.render(game.phase)
+        elapsed_us = (host_time.perf_counter() - started) * 1000000
+        total = totals[name]
+        total[0] += 1
+        total[1] += log.transactions
+        total[2] += log.bytes
+        total[3] += log.allocations
+        total[4] += elapsed_us
+        if panel.image(display.width) != display_buffer(display):
+            mismatches += 1
+
+    phases = {name: summarize(bus, *totals[name], timing) for name in PHASES}
+    overall = [sum(totals[name][i] for name in PHASES) for i in range(5)]
+    return {
+        "bus": "i2c" if isinstance(bus, I2C) else "spi",
+        "init": init,
+        "phases": phases,
+        "total": summarize(bus, *overall, timing),
+        "panel_mismatches": mismatches,
+    }
+
+
+def display_buffer(display):
+    return getattr(display, "displaybuf", None) or display.buffer
+
+
+def main(argv):
+    # the game sees time pass at exactly the tick rate, so runs are repeatable
+    utime.use_virtual()
+    timing = "--timing" in argv
+    output = __file__.rsplit(".", 1)[0] + ".json"
+    if "--output" in argv:
+        output = argv[argv.index("--output") + 1]
+    results = {}
+    for name, make in DRIVERS:
+        result = run_driver(make, timing)
+        results[name] = result
+        for phase, numbers in result["phases"].items():
+            line = "{:12s} {:10s} {:7.1f} B/frame {:5.2f} tx/frame".format(
+                name, phase, numbers["bytes_per_frame"], numbers["transactions_per_frame"])
+            line += "".join(" {:7.2f}ms@{}".format(ms, clock)
+                            for clock, ms in numbers["wire_ms_per_frame"].items())
+            if timing:
+                line += " python {:6.3f}ms".format(numbers["python_ms_per_frame"])
+            print(line)
+        if result["panel_mismatches"]:
+            print("{}: panel differs from the framebuffer in {} frames".format(
+                name, result["panel_mismatches"]))
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print("wrote", output)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,147 @@
+# Characters per second of I2CLcd.putstr on the emulated PCF8574 backpack.
+#
+# Host only, it needs the recording I2C bus of the emulator:
+#   python host/run.py bench/lcd.py
+#
+# Compares the bulk putstr path, which packs the nibble strobes of a line
+# into one writeto, with the previous one that sent every character through
+# putchar as four single-byte writes. The rate is limited by the wire time
+# at the given I2C clock; Python time on the board comes on top. An HD44780
+# model checks that both paths leave the same text on the display.
+#
+# It also compares the bus traffic of updating a score dashboard with
+# clear() and putstr() against write_at() and commit() in retained mode,
+# and checks that retained writes mixed with putstr(), putchar() and
+# move_to() keep the retained copy equal to the display.
+import random
+
+from machine import I2C
+
+from emulator.panels import HD44780Backpack
+from I2C_LCD import I2CLcd, MASK_E, MASK_RS, SHIFT_BACKLIGHT, SHIFT_DATA
+
+I2C_CLOCKS = (100000, 400000)
+SCREENS = (
+    (16, 2, "Reaction Game   Press to start"),
+    (20, 4, "Reaction Game\nPress the button when the ball is close to a wall. Score: 1234"),
+)
+
+
+class PerCharacterLcd(I2CLcd):
+    """I2CLcd as it was before the bulk path."""
+
+    def hal_write_data(self, data):
+        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | (((data >> 4) & 0x0f) << SHIFT_DATA))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | ((data & 0x0f) << SHIFT_DATA))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+
+    def putstr(self, string):
+        for char in string:
+            self.putchar(char)
+
+
+def measure(make, columns, rows, text):
+    i2c = I2C(0, freq=100000)
+    model = HD44780Backpack()
+    i2c.attach(0x27, model)
+    lcd = make(i2c, 0x27, rows, columns)
+    lcd.move_to(0, 0)
+    log = i2c.log
+    log.reset()
+    lcd.putstr(text)
+    rates = {}
+    for hz in I2C_CLOCKS:
+        wire_us = (11 * log.transactions + 9 * log.bytes) * 1000000 / hz
+        rates[hz] = len(text) * 1000000 / wire_us
+    return log.transactions, rates, model.lines(columns, rows)
+
+
+def dashboard(score, seconds):
+    return "Score: {:04d}".format(score), "Time: {:2d}".format(seconds)
+
+
+def measure_dashboard(retained):
+    i2c = I2C(0, freq=100000)
+    model = HD44780Backpack()
+    i2c.attach(0x27, model)
+    lcd = I2CLcd(i2c, 0x27, 2, 16, retained=retained)
+    log = i2c.log
+    log.reset()
+    updates = 20
+    for update in range(updates):
+        lines = dashboard(update * 7, 30 - update)
+        if retained:
+            lcd.write_at(0, 0, lines[0])
+            lcd.write_at(0, 1, lines[1])
+            lcd.commit()
+        else:
+            lcd.clear()
+            lcd.putstr(lines[0] + "\n" + lines[1])
+    expected = [line + " " * (16 - len(line)) for line in lines]
+    return log.transactions / updates, log.bytes / updates, model.lines(16, 2) == expected
+
+
+def check_mixed(columns, rows, seed, steps=300):
+    """Display lines that differ from the retained copy after any step."""
+    i2c = I2C(0, freq=100000)
+    model = HD44780Backpack()
+    i2c.attach(0x27, model)
+    lcd = I2CLcd(i2c, 0x27, rows, columns, retained=True)
+    rng = random.Random(seed)
+    differs = 0
+
+    def compare():
+        shadow = bytes(lcd.shadow).decode()
+        expected = [shadow[row * columns:(row + 1) * columns] for row in range(rows)]
+        return model.lines(columns, rows) != expected
+
+    # a run that ends in the last column, then a character after it
+    lcd.write_at(columns - 5, 0, "abcde")
+    lcd.commit()
+    lcd.putstr("Q")
+    differs += compare()
+    for _ in range(steps):
+        action = rng.randrange(5)
+        text = "".join(rng.choice("abcXYZ0123 ") for _ in range(rng.randint(1, columns)))
+        if action == 0:
+            lcd.write_at(rng.randint(-3, columns), rng.randrange(rows), text)
+        elif action == 1:
+            lcd.commit()
+        elif action == 2:
+            lcd.putstr(text if rng.random() < 0.8 else text + "\n" + text)
+        elif action == 3:
+            lcd.putchar(text[0])
+        else:
+            lcd.move_to(rng.randrange(columns), rng.randrange(rows))
+        differs += compare()
+    return differs
+
+
+def main():
+    for columns, rows, text in SCREENS:
+        results = {}
+        for name, make in (("per-char", PerCharacterLcd), ("bulk", I2CLcd)):
+            transactions, rates, lines = measure(make, columns, rows, text)
+            results[name] = lines
+            print("{}x{} {:8s} {:3d} chars {:4d} writes".format(
+                columns, rows, name, len(text), transactions)
+                + "".join(" {:7.0f} chars/s@{}".format(rate, hz) for hz, rate in rates.items()))
+        if results["per-char"] != results["bulk"]:
+            print("{}x{}: displays differ".format(columns, rows))
+            for a, b in zip(results["per-char"], results["bulk"]):
+                print(" {!r}\n {!r}".format(a, b))
+    for name, retained in (("clear+putstr", False), ("write_at+commit", True)):
+        transactions, nbytes, correct = measure_dashboard(retained)
+        print("dashboard {:15s} {:5.1f} writes {:6.1f} bytes per update{}".format(
+            name, transactions, nbytes, "" if correct else " (display differs)"))
+    for columns, rows in ((16, 2), (20, 4), (40, 2)):
+        differs = sum(check_mixed(columns, rows, seed) for seed in range(10))
+        print("{}x{} mixed retained and direct writes, {} steps differ from the display".format(
+            columns, rows, differs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Frame time of the SH1106 driver for unrotated and rotated displays.
+#
+# Run it on the board, with sh1106.py copied to the board and the display
+# wired as in a_game.py:
+#   mpremote run bench/rotate.py
+#
+# Every mode draws the same scene. "full" clears and redraws everything each
+# frame, "ball" only erases and redraws the moving ball, so with rotate=90/270
+# it shows the cost of remapping just the dirty pages.
+import utime as time
+from machine import Pin, I2C
+
+import sh1106
+
+FRAMES = 60
+
+
+def draw_full(display, frame):
+    display.fill(0)
+    display.text("Reaction Game", 15, 20, 1)
+    display.vline(0, 0, 64, 1)
+    display.vline(63, 0, 64, 1)
+    display.fill_rect(frame % 56 + 1, frame % 24, 8, 8, 1)
+
+
+def draw_ball(display, frame):
+    if frame:
+        display.fill_rect((frame - 1) % 56 + 1, (frame - 1) % 24, 8, 8, 0)
+    display.fill_rect(frame % 56 + 1, frame % 24, 8, 8, 1)
+
+
+def bench(display, draw):
+    draw_us = 0
+    show_us = 0
+    display.fill(0)
+    display.show()
+    for frame in range(FRAMES):
+        started = time.ticks_us()
+        draw(display, frame)
+        drawn = time.ticks_us()
+        display.show()
+        shown = time.ticks_us()
+        draw_us += time.ticks_diff(drawn, started)
+        show_us += time.ticks_diff(shown, drawn)
+    return draw_us // FRAMES, show_us // FRAMES
+
+
+def run(i2c):
+    for rotate in (0, 90, 180, 270):
+        display = sh1106.SH1106_I2C(128, 64, i2c, rotate=rotate)
+        for name, draw in (("full", draw_full), ("ball", draw_ball)):
+            draw_us, show_us = bench(display, draw)
+            print("rotate={:<3d} {:4s} draw={:6d}us show={:6d}us frame={:6d}us".format(
+                rotate, name, draw_us, show_us, draw_us + show_us))
+
+
+if __name__ == "__main__":
+    run(I2C(1, sda=Pin(2), scl=Pin(3), freq=400000))
@@ -0,0 +1,77 @@
+# Heap allocations per show() of the SPI display drivers.
+#
+# Runs on the board with the display on SPI0 (sck=18, mosi=19, dc=16, cs=17,
+# res=20):
+#   mpremote run bench/show_alloc.py
+# or on the host, where the panels are emulated:
+#   python host/run.py bench/show_alloc.py
+#
+# A ball moves over a static frame. The scene is played twice and only the
+# second pass is measured, so buffers the drivers allocate once are not
+# counted. On the board it reports bytes from gc.mem_alloc(), on the host the
+# number of new buffer objects handed to the bus. Either should be zero.
+import gc
+
+from machine import Pin, SPI
+
+import sh1106
+import ssd1306
+
+FRAMES = 60
+
+
+def allocated(bus):
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return bus.log.allocations
+
+
+def draw(display, frame):
+    if frame:
+        display.fill_rect((frame - 1) % 112 + 4, (frame - 1) % 48 + 4, 8, 8, 0)
+    display.fill_rect(frame % 112 + 4, frame % 48 + 4, 8, 8, 1)
+
+
+def bench(display, bus):
+    display.fill(0)
+    display.rect(0, 0, display.width, display.height, 1)
+    display.show()
+    total = 0
+    for measured in (False, True):
+        for frame in range(FRAMES):
+            draw(display, frame)
+            gc.collect()
+            before = allocated(bus)
+            display.show()
+            if measured:
+                total += allocated(bus) - before
+    return total / FRAMES
+
+
+def run(spi, dc, cs, res, attach=None):
+    unit = "bytes" if hasattr(gc, "mem_alloc") else "buffers"
+    for name, make, panel in (
+        ("sh1106_spi", sh1106.SH1106_SPI, "SH1106Panel"),
+        ("ssd1306_spi", ssd1306.SSD1306_SPI, "SSD1306Panel"),
+    ):
+        for retained in (False, True):
+            if attach is not None:
+                attach(panel)
+            display = make(128, 64, spi, dc, res, cs, retained=retained)
+            print("{:12s} retained={:d} {:6.2f} {} allocated per show()".format(
+                name, retained, bench(display, spi), unit))
+
+
+def host_attach(spi, dc, cs):
+    from emulator import panels
+
+    def attach(panel):
+        spi.attach(getattr(panels, panel)(), cs=cs, dc=dc)
+    return attach
+
+
+if __name__ == "__main__":
+    spi = SPI(0, baudrate=10000000, sck=Pin(18), mosi=Pin(19))
+    dc, cs, res = Pin(16), Pin(17), Pin(20)
+    attach = host_attach(spi, dc, cs) if hasattr(spi, "attach") else None
+    run(spi, dc, cs, res, attach)
@@ -0,0 +1,146 @@
+# Headless games on a virtual clock, without display or LEDs.
+#
+# Host only, it needs the virtual clock of the emulator:
+#   python host/run.py bench/simulate.py [--games N] [--output FILE]
+#   python host/run.py bench/simulate.py --replay presses.txt
+#
+# By default a scripted player plays N games (100), one per random seed,
+# while its presses are recorded. Its ticks come up to JITTER_US early or
+# late, as they do on the board. The recorded presses are then replayed on
+# an even clock and must give the same scores. The scores are written to
+# bench/simulate.json (by default), so changes to scoring show up in review,
+# and the speed of the simulation compared to real time is printed.
+#
+# --replay plays the presses a board logged with a_game.RECORD_PRESSES_TO
+# and prints the score of every game in it.
+import json
+import random
+import sys
+import time as host_time
+
+import utime
+
+import a_game
+
+STEP_US = 1000000 // a_game.TICKS_PER_SECOND
+JITTER_US = 2000
+
+
+class Player:
+    """Starts at once and presses when the ball is close to a wall.
+
+    How close varies from press to press, and the press happened a random
+    part of a tick before the tick that takes it.
+    """
+
+    def __init__(self, game, seed):
+        self.game = game
+        self.random = random.Random(seed)
+        self.reach = self.random.randint(2, 24)
+        self.pressed_tick = -1
+
+    def wants_press(self, phase):
+        if isinstance(phase, a_game.MainMenu):
+            return True
+        if isinstance(phase, a_game.InGame):
+            return phase.allowed_to_be_rated() and phase.distance_to_cloest_wall() < self.reach
+        if isinstance(phase, a_game.GameOver):
+            return phase.ticks_left == 0
+        return False
+
+    def pop_press(self):
+        if self.pressed_tick == self.game.ticks or not self.wants_press(self.game.phase):
+            return -1
+        self.pressed_tick = self.game.ticks
+        self.reach = self.random.randint(2, 24)
+        return utime.ticks_add(utime.ticks_us(), -self.random.randrange(STEP_US))
+
+    def clear(self):
+        pass
+
+
+def jittered(seed):
+    """Tick steps of STEP_US, each up to JITTER_US longer or shorter."""
+    rng = random.Random(seed)
+    return lambda tick: STEP_US + rng.randint(-JITTER_US, JITTER_US)
+
+
+def replayed(source):
+    """Tick steps of STEP_US, but as recorded where a press needs it."""
+    return lambda tick: source.duration_us(tick) or STEP_US
+
+
+def play(game, source, games, step_us, is_done=lambda: False):
+    """Ticks until `games` games are over, returns their scores.
+
+    step_us(tick) is the time from the tick before to `tick`.
+    """
+    scores = []
+    phase = None
+    while len(scores) < games and not is_done():
+        utime.advance_us(step_us(game.ticks + 1))
+        game.tick(source)
+        if game.phase is not phase:
+            phase = game.phase
+            if isinstance(phase, a_game.GameOver):
+                scores.append(phase.score)
+    return scores
+
+
+def record_and_replay(seed):
+    game = a_game.Game()
+    log = a_game.PressLog()
+    recorded = play(game, a_game.RecordingInput(Player(game, seed), game, log), 1,
+                    jittered(seed))
+    game = a_game.Game()
+    source = a_game.ReplayInput(log, game)
+    started = host_time.perf_counter()
+    scores = play(game, source, 1, replayed(source))
+    elapsed = host_time.perf_counter() - started
+    return recorded[0], scores[0], game.ticks, elapsed
+
+
+def replay(path):
+    log = a_game.PressLog.load(path, size=4096)
+    game = a_game.Game()
+    source = a_game.ReplayInput(log, game)
+    # once all presses are played, the game in progress is played to its end
+    scores = play(game, source, log.count, replayed(source), lambda: source.next >= log.count and isinstance(
+        game.phase, (a_game.MainMenu, a_game.GameOver)))
+    for number, score in enumerate(scores):
+        print("game {:3d} score {:4d}".format(number + 1, score))
+
+
+def main(argv):
+    utime.use_virtual()
+    if "--replay" in argv:
+        replay(argv[argv.index("--replay") + 1])
+        return 0
+    games = int(argv[argv.index("--games") + 1]) if "--games" in argv else 100
+    output = __file__.rsplit(".", 1)[0] + ".json"
+    if "--output" in argv:
+        output = argv[argv.index("--output") + 1]
+    scores = []
+    mismatches = 0
+    ticks = 0
+    elapsed = 0
+    for seed in range(games):
+        recorded, replayed, game_ticks, game_elapsed = record_and_replay(seed)
+        scores.append(recorded)
+        mismatches += recorded != replayed
+        ticks += game_ticks
+        elapsed += game_elapsed
+    simulated = ticks / a_game.TICKS_PER_SECOND
+    print("{} games, mean score {:.1f}, {} replays differ".format(
+        games, sum(scores) / games, mismatches))
+    print("{:.1f}s of play simulated in {:.3f}s, {:.0f}x real time".format(
+        simulated, elapsed, simulated / elapsed))
+    with open(output, "w") as f:
+        json.dump({"games": games, "scores": scores}, f, indent=2)
+        f.write("\n")
+    print("wrote", output)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,60 @@
+"""Compile the modules listed in src/manifest.py to .mpy bytecode.
+
+    python host/build_mpy.py [--mpy-cross PATH] [--march ARCH] [--output DIR]
+
+Needs mpy-cross of the same MicroPython version as the firmware, either on
+the PATH or installed with `pip install mpy-cross`. The drivers use the
+native code emitter, so the files are built for the Pico's armv6m by
+default. Copy the output to the board's MPY_DIR, where loader.py finds it:
+
+    mpremote mkdir :mpy
+    mpremote cp build/mpy/*.mpy :mpy/
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.normpath(os.path.join(HOST_DIR, "..", "src"))
+BUILD_DIR = os.path.normpath(os.path.join(HOST_DIR, "..", "build", "mpy"))
+
+
+def option(argv, name, default):
+    if name in argv:
+        return argv[argv.index(name) + 1]
+    return default
+
+
+def mpy_cross_command(path):
+    if path:
+        return [path]
+    if shutil.which("mpy-cross"):
+        return ["mpy-cross"]
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def modules():
+    sys.path.insert(0, SRC_DIR)
+    import manifest
+    return tuple(manifest.MODULES) + (manifest.APP,)
+
+
+def main(argv):
+    command = mpy_cross_command(option(argv, "--mpy-cross", None))
+    march = option(argv, "--march", "armv6m")
+    output = option(argv, "--output", BUILD_DIR)
+    os.makedirs(output, exist_ok=True)
+    for name in modules():
+        source = os.path.join(SRC_DIR, name + ".py")
+        target = os.path.join(output, name + ".mpy")
+        result = subprocess.run(command + ["-march=" + march, "-o", target, source])
+        if result.returncode:
+            return result.returncode
+        print("{:10s} {:6d} -> {:6d} bytes".format(
+            name, os.path.getsize(source), os.path.getsize(target)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
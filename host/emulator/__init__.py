@@ -0,0 +1,28 @@
+"""Host-side stand-ins for the MicroPython modules the code in src/ needs.
+
+    import emulator
+    emulator.install()
+    import sh1106   # now importable under CPython
+
+``install()`` registers ``machine``, ``framebuf``, ``micropython``,
+``uasyncio`` and ``utime`` in ``sys.modules`` and puts src/ on the import path.
+"""
+import os
+import sys
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+
+def install():
+    from . import framebuf, machine, micropython, uasyncio, utime
+
+    for name, module in (
+        ("framebuf", framebuf),
+        ("machine", machine),
+        ("micropython", micropython),
+        ("uasyncio", uasyncio),
+        ("utime", utime),
+    ):
+        sys.modules[name] = module
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
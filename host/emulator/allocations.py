@@ -0,0 +1,180 @@
+"""Where MicroPython code allocates on the heap, for host runs.
+
+CPython allocates for almost everything, so its heap counters say little
+about the board. Instead, a Tracer records which source lines of src/ run,
+and the statements on those lines are checked against what MicroPython's
+compiler and runtime allocate for:
+
+- tuples that are not constant, other than the 2 and 3 item swaps
+  `a, b = b, a`, which the compiler turns into stack operations
+- list, dict and set displays, comprehensions and f-strings
+- lambdas and functions defined while running, which make closures
+- slices, which make a slice object and usually a copy
+- float arithmetic and true division, floats are boxed
+- string and bytes concatenation and formatting
+- calls that build objects, such as str(), bytes() or str.format(), and
+  calls with *args or **kwargs
+- raising an exception
+
+It is a model: it does not know the types of names, and it does not see
+allocations inside builtins it has no rule for. It errs towards flagging.
+"""
+import ast
+import os
+import sys
+
+from . import SRC_DIR
+
+_BUILDING_CALLS = {
+    "bytearray", "bytes", "dict", "float", "format", "list", "memoryview",
+    "open", "repr", "set", "sorted", "str", "tuple",
+}
+_BUILDING_METHODS = {
+    "append", "copy", "decode", "encode", "extend", "format", "items",
+    "join", "keys", "split", "values",
+}
+
+
+def _is_constant(node):
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.Tuple):
+        return all(_is_constant(element) for element in node.elts)
+    if isinstance(node, ast.UnaryOp):
+        return _is_constant(node.operand)
+    return False
+
+
+def _is_text(node):
+    return isinstance(node, ast.JoinedStr) or (
+        isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes)))
+
+
+def _is_float(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, float)
+
+
+def _swap_values(statement):
+    # the value tuples of `a, b = c, d` with 2 or 3 items on both sides
+    if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+            and isinstance(statement.targets[0], (ast.Tuple, ast.List))
+            and isinstance(statement.value, ast.Tuple)
+            and len(statement.value.elts) == len(statement.targets[0].elts)
+            and len(statement.value.elts) in (2, 3)):
+        return (statement.value,)
+    return ()
+
+
+def _expressions(statement):
+    # the expressions a statement evaluates itself, without nested statements
+    if isinstance(statement, (ast.If, ast.While)):
+        return [statement.test]
+    if isinstance(statement, ast.For):
+        return [statement.iter, statement.target]
+    if isinstance(statement, ast.With):
+        return [item.context_expr for item in statement.items]
+    if isinstance(statement, (ast.Try, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return []
+    return [node for node in ast.iter_child_nodes(statement) if isinstance(node, ast.expr)]
+
+
+def reasons(statement):
+    """What a statement allocates for, as a list of short descriptions."""
+    found = []
+    if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        found.append("defines a function or class")
+    if isinstance(statement, ast.Raise):
+        found.append("raises an exception")
+    swaps = _swap_values(statement)
+    for expression in _expressions(statement):
+        for node in ast.walk(expression):
+            if isinstance(node, ast.Tuple) and isinstance(node.ctx, ast.Load):
+                if node not in swaps and not _is_constant(node):
+                    found.append("builds a tuple")
+            elif isinstance(node, (ast.List, ast.Dict, ast.Set)) and not isinstance(
+                    getattr(node, "ctx", None), ast.Store):
+                found.append("builds a " + type(node).__name__.lower())
+            elif isinstance(node, (ast.ListComp, ast.DictComp, ast.SetComp, ast.GeneratorExp)):
+                found.append("comprehension")
+            elif isinstance(node, ast.JoinedStr):
+                found.append("f-string")
+            elif isinstance(node, ast.Lambda):
+                found.append("lambda")
+            elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+                found.append("slice")
+            elif isinstance(node, ast.BinOp):
+                if isinstance(node.op, ast.Div):
+                    found.append("true division")
+                elif _is_float(node.left) or _is_float(node.right):
+                    found.append("float arithmetic")
+                elif _is_text(node.left) or _is_text(node.right):
+                    found.append("string or bytes operation")
+            elif isinstance(node, ast.Call):
+                function = node.func
+                if isinstance(function, ast.Name) and function.id in _BUILDING_CALLS:
+                    found.append(function.id + "()")
+                elif isinstance(function, ast.Attribute) and function.attr in _BUILDING_METHODS:
+                    found.append("." + function.attr + "()")
+                if any(isinstance(arg, ast.Starred) for arg in node.args) or any(
+                        keyword.arg is None for keyword in node.keywords):
+                    found.append("*args or **kwargs")
+    return found
+
+
+class _Source:
+    def __init__(self, path):
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        # line -> statements that span it
+        self.statements = {}
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.stmt):
+                continue
+            if isinstance(node, (ast.If, ast.While, ast.For, ast.With, ast.Try)):
+                # only the header, the body has statements of its own
+                last = node.body[0].lineno - 1 if node.body else node.lineno
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                last = node.lineno
+            else:
+                last = node.end_lineno
+            for line in range(node.lineno, max(node.lineno, last) + 1):
+                self.statements.setdefault(line, []).append(node)
+
+
+class Tracer:
+    """Records the lines of src/ that run between start() and stop()."""
+
+    def __init__(self, root=SRC_DIR):
+        self.root = root + os.sep
+        self.lines = set()
+
+    def trace(self, frame, event, arg):
+        if not frame.f_code.co_filename.startswith(self.root):
+            return None
+        if event == "line":
+            self.lines.add((frame.f_code.co_filename, frame.f_lineno))
+        return self.trace
+
+    def start(self):
+        sys.settrace(self.trace)
+
+    def stop(self):
+        sys.settrace(None)
+
+    def findings(self):
+        """(file, line, reasons) of every statement that ran and allocates."""
+        sources = {}
+        seen = set()
+        found = []
+        for path, line in sorted(self.lines):
+            if path not in sources:
+                sources[path] = _Source(path)
+            for statement in sources[path].statements.get(line, ()):
+                if (path, statement.lineno) in seen:
+                    continue
+                seen.add((path, statement.lineno))
+                statement_reasons = reasons(statement)
+                if statement_reasons:
+                    found.append((os.path.relpath(path, self.root), statement.lineno,
+                                  sorted(set(statement_reasons))))
+        return found
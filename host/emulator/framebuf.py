@@ -0,0 +1,243 @@
+"""Pure-Python port of MicroPython's framebuf module.
+
+Pixel placement, clipping, text rendering, blit and scroll follow
+extmod/modframebuf.c so buffers produced here are byte-for-byte what the
+firmware would produce. Only the monochrome formats are implemented.
+"""
+from ._font import FONT_PETME128_8X8
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+_MONO_FORMATS = (MONO_VLSB, MONO_HLSB, MONO_HMSB)
+
+
+class FrameBuffer:
+    # Internal state uses an _fb_ prefix so subclasses (the display drivers)
+    # can keep their own width/height/buffer attributes, as they do on-device.
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in _MONO_FORMATS:
+            raise ValueError("invalid format")
+        if stride is None:
+            stride = width
+        if format in (MONO_HLSB, MONO_HMSB):
+            stride = (stride + 7) & ~7
+        if format == MONO_VLSB:
+            needed = ((height + 7) >> 3) * stride
+        else:
+            needed = (stride >> 3) * height
+        if len(buffer) < needed:
+            raise ValueError("buffer too small")
+        self._fb_buf = buffer
+        self._fb_width = width
+        self._fb_height = height
+        self._fb_format = format
+        self._fb_stride = stride
+
+    # -- format specific primitives -------------------------------------
+
+    def _fb_locate(self, x, y):
+        fmt = self._fb_format
+        if fmt == MONO_VLSB:
+            return (y >> 3) * self._fb_stride + x, y & 7
+        index = (x + y * self._fb_stride) >> 3
+        if fmt == MONO_HMSB:
+            return index, x & 7
+        return index, 7 - (x & 7)
+
+    def _fb_setpixel(self, x, y, col):
+        index, offset = self._fb_locate(x, y)
+        buf = self._fb_buf
+        buf[index] = (buf[index] & ~(1 << offset)) | ((col != 0) << offset)
+
+    def _fb_getpixel(self, x, y):
+        index, offset = self._fb_locate(x, y)
+        return (self._fb_buf[index] >> offset) & 1
+
+    def _fb_fill_rect(self, x, y, w, h, col):
+        if (h < 1 or w < 1 or x + w <= 0 or y + h <= 0
+                or y >= self._fb_height or x >= self._fb_width):
+            return
+        xend = min(self._fb_width, x + w)
+        yend = min(self._fb_height, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+        buf = self._fb_buf
+        if self._fb_format == MONO_VLSB:
+            stride = self._fb_stride
+            while y < yend:
+                page = y >> 3
+                last = min(yend, (page + 1) << 3)
+                mask = ((1 << (last - y)) - 1) << (y & 7)
+                value = mask if col else 0
+                keep = ~mask & 0xff
+                base = page * stride
+                for i in range(base + x, base + xend):
+                    buf[i] = (buf[i] & keep) | value
+                y = last
+        else:
+            for yy in range(y, yend):
+                for xx in range(x, xend):
+                    self._fb_setpixel(xx, yy, col)
+
+    # -- public API ------------------------------------------------------
+
+    def fill(self, c):
+        if self._fb_format == MONO_VLSB:
+            value = 0xff if c else 0x00
+            buf = self._fb_buf
+            end = ((self._fb_height + 7) >> 3) * self._fb_stride
+            if self._fb_stride == self._fb_width:
+                buf[0:end] = bytes((value,)) * end
+                return
+        self._fb_fill_rect(0, 0, self._fb_width, self._fb_height, c)
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self._fb_width and 0 <= y < self._fb_height:
+            if c is None:
+                return self._fb_getpixel(x, y)
+            self._fb_setpixel(x, y, c)
+        return None
+
+    def fill_rect(self, x, y, w, h, c):
+        self._fb_fill_rect(x, y, w, h, c)
+
+    def hline(self, x, y, w, c):
+        self._fb_fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self._fb_fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self._fb_fill_rect(x, y, w, h, c)
+        else:
+            self._fb_fill_rect(x, y, w, 1, c)
+            self._fb_fill_rect(x, y + h - 1, w, 1, c)
+            self._fb_fill_rect(x, y, 1, h, c)
+            self._fb_fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        width = self._fb_width
+        height = self._fb_height
+        dx = x2 - x1
+        if dx > 0:
+            sx = 1
+        else:
+            dx = -dx
+            sx = -1
+        dy = y2 - y1
+        if dy > 0:
+            sy = 1
+        else:
+            dy = -dy
+            sy = -1
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                if 0 <= y1 < width and 0 <= x1 < height:
+                    self._fb_setpixel(y1, x1, c)
+            else:
+                if 0 <= x1 < width and 0 <= y1 < height:
+                    self._fb_setpixel(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        if 0 <= x2 < width and 0 <= y2 < height:
+            self._fb_setpixel(x2, y2, c)
+
+    def text(self, s, x0, y0, c=1):
+        width = self._fb_width
+        height = self._fb_height
+        if isinstance(s, str):
+            s = s.encode()
+        for ch in s:
+            if ch < 32 or ch > 127:
+                ch = 127
+            base = (ch - 32) * 8
+            for j in range(8):
+                if 0 <= x0 < width:
+                    vline_data = FONT_PETME128_8X8[base + j]
+                    y = y0
+                    while vline_data:
+                        if vline_data & 1 and 0 <= y < height:
+                            self._fb_setpixel(x0, y, c)
+                        vline_data >>= 1
+                        y += 1
+                x0 += 1
+
+    def scroll(self, xstep, ystep):
+        width = self._fb_width
+        height = self._fb_height
+        if xstep < 0:
+            sx = 0
+            xend = width + xstep
+            if xend <= 0:
+                return
+            dx = 1
+        else:
+            sx = width - 1
+            xend = xstep - 1
+            if xend >= sx:
+                return
+            dx = -1
+        if ystep < 0:
+            y = 0
+            yend = height + ystep
+            if yend <= 0:
+                return
+            dy = 1
+        else:
+            y = height - 1
+            yend = ystep - 1
+            if yend >= y:
+                return
+            dy = -1
+        while y != yend:
+            x = sx
+            while x != xend:
+                self._fb_setpixel(x, y, self._fb_getpixel(x - xstep, y - ystep))
+                x += dx
+            y += dy
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        if (x >= self._fb_width or y >= self._fb_height
+                or -x >= fbuf._fb_width or -y >= fbuf._fb_height):
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x0end = min(self._fb_width, x + fbuf._fb_width)
+        y0end = min(self._fb_height, y + fbuf._fb_height)
+        while y0 < y0end:
+            cx1 = x1
+            for cx0 in range(x0, x0end):
+                col = fbuf._fb_getpixel(cx1, y1)
+                if palette is not None:
+                    col = palette._fb_getpixel(col, 0)
+                if col != key:
+                    self._fb_setpixel(cx0, y0, col)
+                cx1 += 1
+            y1 += 1
+            y0 += 1
+
+
+def FrameBuffer1(buffer, width, height, stride=None):
+    return FrameBuffer(buffer, width, height, MONO_VLSB, stride)
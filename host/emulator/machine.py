@@ -0,0 +1,300 @@
+"""machine module for CPython with recording buses.
+
+``I2C`` and ``SPI`` log every transaction into a ``BusLog``: the number of
+transactions, payload bytes, the time the transfer would occupy the wire
+at the configured clock, and how many previously unseen buffer objects were
+handed to the bus (a proxy for per-call heap allocations on the device).
+Devices such as the panel models in ``emulator.panels`` can be attached to
+receive the traffic.
+"""
+from . import utime
+
+
+def freq(hz=None):
+    return 125000000 if hz is None else None
+
+
+def unique_id():
+    return b"\xe6\x61\x38\x52\x43\x2b\x11\x29"
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = self.IN
+        self.pull = None
+        self._value = 0
+        self._irq_handler = None
+        self._irq_trigger = 0
+        self._listeners = []
+        self.init(mode, pull, value=value)
+
+    def __repr__(self):
+        return "Pin({})".format(self.id)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self.mode = mode
+        if pull != -1:
+            self.pull = pull
+            if pull == self.PULL_UP:
+                self._value = 1
+            elif pull == self.PULL_DOWN:
+                self._value = 0
+        if value is not None:
+            self._set(value)
+
+    def value(self, x=None):
+        if x is None:
+            return self._value
+        self._set(x)
+        return None
+
+    __call__ = value
+
+    def on(self):
+        self._set(1)
+
+    def off(self):
+        self._set(0)
+
+    high = on
+    low = off
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._irq_handler = handler
+        self._irq_trigger = trigger if handler is not None else 0
+
+    def add_listener(self, listener):
+        """Calls listener(pin, level) whenever the level changes."""
+        self._listeners.append(listener)
+
+    def drive(self, level):
+        """Simulates an external signal on an input pin, firing IRQs."""
+        self._set(level)
+
+    def _set(self, level):
+        level = 1 if level else 0
+        previous = self._value
+        self._value = level
+        if level == previous:
+            return
+        for listener in self._listeners:
+            listener(self, level)
+        if self._irq_handler is not None:
+            edge = self.IRQ_RISING if level else self.IRQ_FALLING
+            if self._irq_trigger & edge:
+                self._irq_handler(self)
+
+
+class PWM:
+    def __init__(self, pin, freq=None, duty_u16=None):
+        self.pin = pin
+        self._freq = 0
+        self._duty_u16 = 0
+        self.updates = 0
+        if freq is not None:
+            self.freq(freq)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+        return None
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty_u16
+        self._duty_u16 = value & 0xffff
+        self.updates += 1
+        return None
+
+    def duty_ns(self, value=None):
+        period_ns = 1000000000 // self._freq if self._freq else 0
+        if value is None:
+            return self._duty_u16 * period_ns // 65535
+        self.duty_u16(value * 65535 // period_ns if period_ns else 0)
+        return None
+
+    def deinit(self):
+        self._duty_u16 = 0
+
+
+class BusLog:
+    def __init__(self):
+        self._seen = {}
+        self.reset()
+
+    def reset(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.wire_us = 0.0
+        self.allocations = 0
+
+    def note_buffer(self, buf):
+        # Buffers are kept alive so ids of freed temporaries are never reused.
+        key = id(buf)
+        if key not in self._seen:
+            self._seen[key] = buf
+            self.allocations += 1
+
+    def snapshot(self):
+        return {
+            "transactions": self.transactions,
+            "bytes": self.bytes,
+            "wire_us": round(self.wire_us, 1),
+            "allocations": self.allocations,
+        }
+
+
+class I2C:
+    def __init__(self, id=0, scl=None, sda=None, freq=400000, timeout=50000,
+                 realtime=False):
+        self.id = id
+        self.scl = scl
+        self.sda = sda
+        self.freq = freq
+        self.realtime = realtime
+        self.log = BusLog()
+        self.devices = {}
+
+    def attach(self, addr, device):
+        self.devices[addr] = device
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def wire_us(self, nbytes, freq=None):
+        # START, address byte + ACK, data bytes + ACK each, STOP
+        bits = 1 + 9 + 9 * nbytes + 1
+        return bits * 1000000 / (freq or self.freq)
+
+    def _transfer(self, addr, data):
+        log = self.log
+        wire_us = self.wire_us(len(data))
+        log.transactions += 1
+        log.bytes += len(data)
+        log.wire_us += wire_us
+        if self.realtime:
+            utime.advance_us(wire_us)
+        device = self.devices.get(addr)
+        if device is not None:
+            device.i2c_write(data)
+
+    def writeto(self, addr, buf, stop=True):
+        self.log.note_buffer(buf)
+        self._transfer(addr, bytes(buf))
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        data = b""
+        for buf in vector:
+            self.log.note_buffer(buf)
+            data += bytes(buf)
+        self._transfer(addr, data)
+        return len(data)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        self._transfer(addr, b"")
+        return bytes(nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        self._transfer(addr, b"")
+        for i in range(len(buf)):
+            buf[i] = 0
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id=0, baudrate=1000000, polarity=0, phase=0, bits=8,
+                 firstbit=MSB, sck=None, mosi=None, miso=None, realtime=False):
+        self.id = id
+        self.baudrate = baudrate
+        self.realtime = realtime
+        self.inits = 0
+        self.log = BusLog()
+        self.device = None
+        self.cs = None
+        self.dc = None
+        self._in_transaction = False
+
+    def init(self, baudrate=None, polarity=0, phase=0, bits=8, firstbit=MSB,
+             sck=None, mosi=None, miso=None):
+        if baudrate is not None:
+            self.baudrate = baudrate
+        self.inits += 1
+
+    def deinit(self):
+        pass
+
+    def attach(self, device, cs=None, dc=None):
+        """Routes writes to device.spi_write(dc_level, data).
+
+        With a CS pin attached, a transaction is one CS assertion;
+        otherwise every write() call counts as one. Like on a real bus, the
+        device ignores bytes clocked out while CS is high.
+        """
+        self.device = device
+        self.cs = cs
+        self.dc = dc
+        if cs is not None:
+            cs.add_listener(self._cs_changed)
+
+    def _cs_changed(self, pin, level):
+        if level:
+            self._in_transaction = False
+
+    def wire_us(self, nbytes, baudrate=None):
+        return nbytes * 8 * 1000000 / (baudrate or self.baudrate)
+
+    def write(self, buf):
+        log = self.log
+        log.note_buffer(buf)
+        data = bytes(buf)
+        if self.cs is None or not self._in_transaction:
+            log.transactions += 1
+            self._in_transaction = self.cs is not None and not self.cs.value()
+        wire_us = self.wire_us(len(data))
+        log.bytes += len(data)
+        log.wire_us += wire_us
+        if self.realtime:
+            utime.advance_us(wire_us)
+        if self.device is not None and (self.cs is None or not self.cs.value()):
+            dc = self.dc.value() if self.dc is not None else 1
+            self.device.spi_write(dc, data)
+
+    def read(self, nbytes, write=0x00):
+        return bytes(nbytes)
+
+    def readinto(self, buf, write=0x00):
+        for i in range(len(buf)):
+            buf[i] = 0
+
+    def write_readinto(self, write_buf, read_buf):
+        self.write(write_buf)
+        self.readinto(read_buf)
@@ -0,0 +1,57 @@
+"""micropython module for CPython.
+
+Code emitters have no meaning on the host, so ``native`` is a no-op. Viper
+and inline assembler functions cannot run under CPython and fail loudly.
+"""
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    raise NotImplementedError("viper functions cannot run on the host: " + func.__name__)
+
+
+def asm_thumb(func):
+    raise NotImplementedError("asm_thumb functions cannot run on the host: " + func.__name__)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def opt_level(level=None):
+    return 0 if level is None else None
+
+
+def mem_info(verbose=False):
+    print("mem: not available on the host")
+
+
+def qstr_info(verbose=False):
+    pass
+
+
+def stack_use():
+    return 0
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def kbd_intr(chr):
+    pass
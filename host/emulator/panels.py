@@ -0,0 +1,262 @@
+"""Command-level models of the display controllers driven from src/.
+
+The models decode the command and data streams a driver sends and keep the
+controller's display RAM, so a host run can check that what ends up on the
+glass matches the driver's framebuffer.
+"""
+
+_I2C_CO = 0x80
+_I2C_DC = 0x40
+
+
+class _Panel:
+    # commands that take one argument byte
+    ARG_COMMANDS = ()
+
+    def __init__(self, columns, pages):
+        self.columns = columns
+        self.pages = pages
+        self.ram = bytearray(columns * pages)
+        self.page = 0
+        self.column = 0
+        self.display_on = False
+        self.inverted = False
+        self.contrast = 0x7f
+        self.seg_remap = False
+        self.com_reversed = False
+        self.commands = 0
+        self._pending = []
+        self._needed = 0
+
+    # -- transports ------------------------------------------------------
+
+    def i2c_write(self, data):
+        i = 0
+        n = len(data)
+        while i < n:
+            control = data[i]
+            i += 1
+            if control & _I2C_CO:
+                if i < n:
+                    self._byte(control & _I2C_DC, data[i])
+                    i += 1
+            else:
+                is_data = control & _I2C_DC
+                while i < n:
+                    self._byte(is_data, data[i])
+                    i += 1
+
+    def spi_write(self, dc, data):
+        for byte in data:
+            self._byte(dc, byte)
+
+    def _byte(self, is_data, byte):
+        if is_data:
+            self.write_ram(byte)
+            return
+        if self._needed:
+            self._pending.append(byte)
+            self._needed -= 1
+            if not self._needed:
+                self.command(self._pending)
+            return
+        needed = self.arguments(byte)
+        if needed:
+            self._pending = [byte]
+            self._needed = needed
+        else:
+            self.command([byte])
+
+    # -- controller specifics --------------------------------------------
+
+    def arguments(self, cmd):
+        return 1 if cmd in self.ARG_COMMANDS else 0
+
+    def command(self, cmd):
+        self.commands += 1
+        op = cmd[0]
+        if op == 0xae or op == 0xaf:
+            self.display_on = op == 0xaf
+        elif op == 0xa6 or op == 0xa7:
+            self.inverted = op == 0xa7
+        elif op == 0xa0 or op == 0xa1:
+            self.seg_remap = op == 0xa1
+        elif op == 0xc0 or op == 0xc8:
+            self.com_reversed = op == 0xc8
+        elif op == 0x81:
+            self.contrast = cmd[1]
+
+    def write_ram(self, byte):
+        raise NotImplementedError
+
+    def image(self, width):
+        """The visible RAM as a page-major buffer `width` columns wide."""
+        raise NotImplementedError
+
+
+class SH1106Panel(_Panel):
+    ARG_COMMANDS = (0x81, 0xa8, 0xad, 0xd3, 0xd5, 0xd9, 0xda, 0xdb)
+    COLUMN_OFFSET = 2
+
+    def __init__(self):
+        super().__init__(132, 8)
+
+    def command(self, cmd):
+        op = cmd[0]
+        if len(cmd) == 1 and op <= 0x0f:
+            self.column = (self.column & 0xf0) | op
+        elif len(cmd) == 1 and 0x10 <= op <= 0x1f:
+            self.column = (self.column & 0x0f) | ((op & 0x0f) << 4)
+        elif len(cmd) == 1 and 0xb0 <= op <= 0xb7:
+            self.page = op & 0x07
+        else:
+            super().command(cmd)
+            return
+        self.commands += 1
+
+    def write_ram(self, byte):
+        if self.column < self.columns:
+            self.ram[self.page * self.columns + self.column] = byte
+            self.column += 1
+
+    def image(self, width=128):
+        out = bytearray(width * self.pages)
+        for page in range(self.pages):
+            start = page * self.columns + self.COLUMN_OFFSET
+            out[page * width:(page + 1) * width] = self.ram[start:start + width]
+        return out
+
+
+class SSD1306Panel(_Panel):
+    ARG_COMMANDS = (0x20, 0x81, 0x8d, 0xa8, 0xd3, 0xd5, 0xd9, 0xda, 0xdb)
+
+    def __init__(self):
+        super().__init__(128, 8)
+        self.addressing = 0x02
+        self.col_start = 0
+        self.col_end = 127
+        self.page_start = 0
+        self.page_end = 7
+
+    def arguments(self, cmd):
+        if cmd == 0x21 or cmd == 0x22:
+            return 2
+        return super().arguments(cmd)
+
+    def command(self, cmd):
+        op = cmd[0]
+        if op == 0x20 and len(cmd) == 2:
+            self.addressing = cmd[1] & 0x03
+        elif op == 0x21 and len(cmd) == 3:
+            self.col_start = cmd[1] & 0x7f
+            self.col_end = cmd[2] & 0x7f
+            self.column = self.col_start
+        elif op == 0x22 and len(cmd) == 3:
+            self.page_start = cmd[1] & 0x07
+            self.page_end = cmd[2] & 0x07
+            self.page = self.page_start
+        elif len(cmd) == 1 and op <= 0x0f and self.addressing == 0x02:
+            self.column = (self.column & 0xf0) | op
+        elif len(cmd) == 1 and 0x10 <= op <= 0x1f and self.addressing == 0x02:
+            self.column = (self.column & 0x0f) | ((op & 0x0f) << 4)
+        elif len(cmd) == 1 and 0xb0 <= op <= 0xb7:
+            self.page = op & 0x07
+        else:
+            super().command(cmd)
+            return
+        self.commands += 1
+
+    def write_ram(self, byte):
+        self.ram[self.page * self.columns + self.column] = byte
+        if self.addressing == 0x00:
+            self.column += 1
+            if self.column > self.col_end:
+                self.column = self.col_start
+                self.page += 1
+                if self.page > self.page_end:
+                    self.page = self.page_start
+        elif self.column < self.columns - 1:
+            self.column += 1
+
+    def image(self, width=128):
+        offset = 32 if width == 64 else 0
+        out = bytearray(width * self.pages)
+        for page in range(self.pages):
+            start = page * self.columns + offset
+            out[page * width:(page + 1) * width] = self.ram[start:start + width]
+        return out
+
+
+class HD44780Backpack:
+    """HD44780 character LCD behind a PCF8574 I2C backpack in 4-bit mode.
+
+    Every byte written over I2C sets the expander pins, a nibble is latched
+    on the falling edge of E. Only DDRAM contents are modelled.
+    """
+    _RS = 0x01
+    _E = 0x04
+    # DDRAM address of the first column of each line, as in LcdApi.move_to
+    LINE_ADDRESSES = (0x00, 0x40, 0x14, 0x54)
+
+    def __init__(self):
+        self.ddram = bytearray(b" " * 0x80)
+        self.address = 0
+        self.four_bit = False
+        self.display_on = False
+        self.backlight = False
+        self.commands = 0
+        self.characters = 0
+        self._pins = 0
+        self._high = None
+
+    def i2c_write(self, data):
+        for byte in data:
+            if self._pins & self._E and not byte & self._E:
+                self._latch(self._pins)
+            self._pins = byte
+            self.backlight = bool(byte & 0x08)
+
+    def _latch(self, pins):
+        nibble = pins >> 4
+        if not self.four_bit:
+            # 8-bit mode, the low data lines are not wired and read as 0
+            self._byte(pins & self._RS, nibble << 4)
+        elif self._high is None:
+            self._high = nibble
+        else:
+            self._byte(pins & self._RS, (self._high << 4) | nibble)
+            self._high = None
+
+    def _byte(self, rs, byte):
+        if rs:
+            self.ddram[self.address] = byte
+            self.characters += 1
+            self._advance()
+            return
+        self.commands += 1
+        if byte & 0x80:
+            self.address = byte & 0x7f
+        elif byte & 0x40:
+            pass  # CGRAM address, glyph data is not modelled
+        elif byte & 0x20:
+            self.four_bit = not byte & 0x10
+        elif byte & 0x08:
+            self.display_on = bool(byte & 0x04)
+        elif byte & 0x02:
+            self.address = 0
+        elif byte & 0x01:
+            self.ddram[:] = b" " * len(self.ddram)
+            self.address = 0
+
+    def _advance(self):
+        # in two line mode each line is 40 characters of a 0x00/0x40 bank
+        self.address += 1
+        if self.address == 0x28:
+            self.address = 0x40
+        elif self.address >= 0x68:
+            self.address = 0x00
+
+    def lines(self, columns, rows):
+        """The visible characters as a list of strings."""
+        return [bytes(self.ddram[start:start + columns]).decode()
+                for start in self.LINE_ADDRESSES[:rows]]
@@ -0,0 +1,11 @@
+"""uasyncio on top of CPython's asyncio.
+
+Adds the MicroPython-only ``sleep_ms``. Sleeps take real time, the
+emulator's virtual clock does not apply to tasks.
+"""
+from asyncio import *  # noqa: F401,F403
+from asyncio import sleep
+
+
+async def sleep_ms(ms):
+    await sleep(ms / 1000)
@@ -0,0 +1,107 @@
+"""utime with a controllable clock.
+
+By default ticks follow the host's monotonic clock. ``use_virtual()``
+switches to a simulated clock that only moves when something sleeps or
+calls ``advance_us``, which makes frame pacing reproducible.
+"""
+import time as _time
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = _TICKS_PERIOD >> 1
+
+
+class Clock:
+    def __init__(self):
+        self.virtual = False
+        self._virtual_us = 0
+        self._offset_us = 0
+
+    def now_us(self):
+        if self.virtual:
+            return self._virtual_us
+        return int(_time.perf_counter() * 1000000) + self._offset_us
+
+    def advance_us(self, us):
+        if self.virtual:
+            self._virtual_us += int(us)
+        else:
+            self._offset_us += int(us)
+
+    def sleep_us(self, us):
+        if us <= 0:
+            return
+        if self.virtual:
+            self._virtual_us += int(us)
+        else:
+            _time.sleep(us / 1000000)
+
+
+clock = Clock()
+
+
+def use_virtual(start_us=0):
+    clock.virtual = True
+    clock._virtual_us = start_us
+
+
+def use_real():
+    clock.virtual = False
+
+
+def advance_us(us):
+    clock.advance_us(us)
+
+
+def advance_ms(ms):
+    clock.advance_us(ms * 1000)
+
+
+def ticks_us():
+    return clock.now_us() & _TICKS_MAX
+
+
+def ticks_ms():
+    return (clock.now_us() // 1000) & _TICKS_MAX
+
+
+ticks_cpu = ticks_us
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+
+def sleep(seconds):
+    clock.sleep_us(seconds * 1000000)
+
+
+def sleep_ms(ms):
+    clock.sleep_us(ms * 1000)
+
+
+def sleep_us(us):
+    clock.sleep_us(us)
+
+
+def time():
+    return int(_time.time())
+
+
+def time_ns():
+    return _time.time_ns()
+
+
+def localtime(secs=None):
+    return _time.localtime(secs)[:8]
+
+
+gmtime = localtime
+
+
+def mktime(t):
+    return int(_time.mktime(tuple(t) + (0,) * (9 - len(t))))
@@ -0,0 +1,31 @@
+"""Run a script from this repository under CPython with the emulator.
+
+    python host/run.py bench/rotate.py
+    python host/run.py src/a_game.py
+
+The emulated modules are installed first, src/ and the script's own
+directory are put on the import path, and the script runs as __main__.
+"""
+import os
+import runpy
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import emulator  # noqa: E402
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__.strip())
+        return 2
+    script = os.path.abspath(argv[1])
+    emulator.install()
+    sys.argv = argv[1:]
+    sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,6 +1,5 @@
 from LCD_API import LcdApi
 from machine import I2C
-from time import sleep_ms
 
 # Defines shifts or masks for the various LCD line attached to the PCF8574
 
@@ -12,26 +11,40 @@ SHIFT_DATA = 4
 
 
 class I2CLcd(LcdApi):
-    def __init__(self, i2c, i2c_addr, num_lines, num_columns):
+    def __init__(self, i2c, i2c_addr, num_lines, num_columns, retained=False):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
+        # E high/low strobes of both nibbles, 4 bytes per character. The
+        # PCF8574 latches every byte, so a whole line goes out in one writeto.
+        # A byte is 9 bits on the bus, about 22.5us at 400kHz, so a character
+        # takes about 90us, well over the 37us the LCD needs to process it,
+        # and no delays are needed between them. The PCF8574 is only rated
+        # for 100kHz, where a character takes about 360us.
+        self.strobe_chars = min(num_columns, 40)
+        self.strobes = bytearray(4 * self.strobe_chars)
+        strobes = memoryview(self.strobes)
+        self.strobe_views = [strobes[:4 * n] for n in range(self.strobe_chars + 1)]
         self.i2c.writeto(self.i2c_addr, bytearray([0]))
-        sleep_ms(20)   # Allow LCD time to powerup
+        self.busy_for(20000)   # Allow LCD time to powerup
         # Send reset 3 times
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
-        sleep_ms(5)    # need to delay at least 4.1 msec
+        self.busy_for(5000)    # need to delay at least 4.1 msec
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
-        sleep_ms(1)
+        self.busy_for(1000)
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
-        sleep_ms(1)
+        self.busy_for(1000)
         # Put LCD into 4 bit mode
         self.hal_write_init_nibble(self.LCD_FUNCTION)
-        sleep_ms(1)
-        LcdApi.__init__(self, num_lines, num_columns)
+        self.busy_for(1000)
+        # the function set goes before LcdApi.__init__, whose last command
+        # is the clear, so the constructor returns while the LCD clears.
+        # The backlight stays off until LcdApi.__init__ turns it on.
+        self.backlight = False
         cmd = self.LCD_FUNCTION
         if num_lines > 1:
             cmd |= self.LCD_FUNCTION_2LINES
         self.hal_write_command(cmd)
+        LcdApi.__init__(self, num_lines, num_columns, retained)
 
     def hal_write_init_nibble(self, nibble):
         """Writes an initialization nibble to the LCD.
@@ -39,6 +52,7 @@ class I2CLcd(LcdApi):
         This particular function is only used during initialization.
         """
         byte = ((nibble >> 4) & 0x0f) << SHIFT_DATA
+        self.wait_ready()
         self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
         self.i2c.writeto(self.i2c_addr, bytearray([byte]))
 
@@ -55,21 +69,41 @@ class I2CLcd(LcdApi):
 
         Data is latched on the falling edge of E.
         """
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.pack(0, (self.backlight << SHIFT_BACKLIGHT), cmd)
+        self.wait_ready()
+        self.i2c.writeto(self.i2c_addr, self.strobe_views[1])
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
-            sleep_ms(5)
+            self.busy_for(5000)
 
     def hal_write_data(self, data):
         """Write data to the LCD."""
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | (((data >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | ((data & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.pack(0, MASK_RS | (self.backlight << SHIFT_BACKLIGHT), data)
+        self.wait_ready()
+        self.i2c.writeto(self.i2c_addr, self.strobe_views[1])
+
+    def hal_write_string(self, string, start, end):
+        """Writes the characters string[start:end] to the LCD, a line of
+        characters per I2C transaction.
+        """
+        control = MASK_RS | (self.backlight << SHIFT_BACKLIGHT)
+        chars = isinstance(string, str)
+        self.wait_ready()
+        while start < end:
+            count = min(end - start, self.strobe_chars)
+            for i in range(count):
+                char = string[start + i]
+                self.pack(i, control, ord(char) if chars else char)
+            self.i2c.writeto(self.i2c_addr, self.strobe_views[count])
+            start += count
+
+    def pack(self, index, control, byte):
+        """Puts the strobes sending byte into slot index of the buffer."""
+        strobes = self.strobes
+        i = 4 * index
+        high = control | (byte & 0xf0)
+        low = control | ((byte & 0x0f) << SHIFT_DATA)
+        strobes[i] = high | MASK_E
+        strobes[i + 1] = high
+        strobes[i + 2] = low | MASK_E
+        strobes[i + 3] = low
@@ -1,4 +1,8 @@
-import time
+import utime as time
+
+# Unchanged characters between two changed ones that commit() rewrites
+# rather than moving the cursor, a move costs as much as one character.
+_COMMIT_GAP = 1
 
 class LcdApi:
     # The following constant names were lifted from the avrlib lcd.h
@@ -38,31 +42,47 @@ class LcdApi:
     LCD_RW_WRITE = 0
     LCD_RW_READ = 1
 
-    def __init__(self, num_lines, num_columns):
+    # Slow operations don't sleep, they mark the LCD busy until a deadline
+    # and the hal waits only if it writes again before the deadline.
+    busy = False
+    busy_until = 0
+
+    def __init__(self, num_lines, num_columns, retained=False):
         self.num_lines = num_lines
         if self.num_lines > 4:
             self.num_lines = 4
         self.num_columns = num_columns
         if self.num_columns > 40:
             self.num_columns = 40
+        # retained mode keeps what is on the display (shadow) and what
+        # write_at() asked for (pending), commit() sends the difference
+        self.retained = retained
+        if retained:
+            self.shadow = bytearray(b' ' * (self.num_lines * self.num_columns))
+            self.pending = bytearray(self.shadow)
         self.cursor_x = 0
         self.cursor_y = 0
         self.backlight = True
         self.display_off()
         self.backlight_on()
-        self.clear()
         self.hal_write_command(self.LCD_ENTRY_MODE | self.LCD_ENTRY_INC)
         self.hide_cursor()
         self.display_on()
+        # last, so the caller can do other work while the LCD clears
+        self.clear()
 
     def clear(self):
         """Clears the LCD display and moves the cursor to the top left
         corner.
         """
+        # clearing also returns the cursor home
         self.hal_write_command(self.LCD_CLR)
-        self.hal_write_command(self.LCD_HOME)
         self.cursor_x = 0
         self.cursor_y = 0
+        if self.retained:
+            for i in range(len(self.shadow)):
+                self.shadow[i] = 0x20
+                self.pending[i] = 0x20
 
     def show_cursor(self):
         """Causes the cursor to be made visible."""
@@ -126,22 +146,126 @@ class LcdApi:
         """Writes the indicated character to the LCD at the current cursor
         position, and advances the cursor by one position.
         """
+        if self.cursor_x >= self.num_columns:
+            # commit() leaves the cursor past the end of the line
+            self.next_line()
         if char != '\n':
             self.hal_write_data(ord(char))
+            if self.retained:
+                self.retain(char, 0, 1, self.cursor_x, self.cursor_y)
             self.cursor_x += 1
         if self.cursor_x >= self.num_columns or char == '\n':
-            self.cursor_x = 0
-            self.cursor_y += 1
-            if self.cursor_y >= self.num_lines:
-                self.cursor_y = 0
-            self.move_to(self.cursor_x, self.cursor_y)
+            self.next_line()
+
+    def next_line(self):
+        """Moves the cursor to the start of the next line, the first line
+        follows the last.
+        """
+        cursor_y = self.cursor_y + 1
+        if cursor_y >= self.num_lines:
+            cursor_y = 0
+        self.move_to(0, cursor_y)
 
     def putstr(self, string):
         """Write the indicated string to the LCD at the current cursor
         position and advances the cursor position appropriately.
+
+        The characters up to each line wrap are handed to the hal in one
+        go, which is much faster than putchar() for HALs with a bulk path.
         """
+        if self.cursor_x >= self.num_columns:
+            # commit() leaves the cursor past the end of the line
+            self.next_line()
+        start = 0
+        end = 0
+        run_x = cursor_x = self.cursor_x
         for char in string:
-            self.putchar(char)
+            end += 1
+            if char == '\n':
+                if end - 1 > start:
+                    self.put_run(string, start, end - 1, run_x)
+                cursor_x = self.num_columns
+                start = end
+            else:
+                cursor_x += 1
+            if cursor_x >= self.num_columns:
+                if end > start:
+                    self.put_run(string, start, end, run_x)
+                start = end
+                run_x = cursor_x = 0
+                self.next_line()
+        if end > start:
+            self.put_run(string, start, end, run_x)
+        self.cursor_x = cursor_x
+
+    def put_run(self, string, start, end, cursor_x):
+        """Writes string[start:end] to the current line, starting at
+        column cursor_x.
+        """
+        self.hal_write_string(string, start, end)
+        if self.retained:
+            self.retain(string, start, end, cursor_x, self.cursor_y)
+
+    def write_at(self, cursor_x, cursor_y, text):
+        """Puts text at the indicated position of a retained display,
+        cut off at the end of the line. Nothing is sent before commit().
+        """
+        columns = self.num_columns
+        if not 0 <= cursor_y < self.num_lines or cursor_x >= columns:
+            return
+        start = 0
+        if cursor_x < 0:
+            start = -cursor_x
+            cursor_x = 0
+        pending = self.pending
+        i = cursor_y * columns + cursor_x
+        for char in text[start:start + columns - cursor_x]:
+            pending[i] = ord(char)
+            i += 1
+
+    def commit(self):
+        """Sends the characters put by write_at() that differ from what
+        the display shows, moving the cursor only between runs that are
+        not contiguous.
+        """
+        shadow = self.shadow
+        pending = self.pending
+        columns = self.num_columns
+        for cursor_y in range(self.num_lines):
+            row = cursor_y * columns
+            x = 0
+            while x < columns:
+                if pending[row + x] == shadow[row + x]:
+                    x += 1
+                    continue
+                last = x
+                end = x + 1
+                while end < columns and end - last <= _COMMIT_GAP + 1:
+                    if pending[row + end] != shadow[row + end]:
+                        last = end
+                    end += 1
+                end = last + 1
+                if self.cursor_x != x or self.cursor_y != cursor_y:
+                    self.move_to(x, cursor_y)
+                self.hal_write_string(pending, row + x, row + end)
+                for i in range(row + x, row + end):
+                    shadow[i] = pending[i]
+                # at the end of the line this is past it, the display would
+                # continue on another line, so putchar() and putstr() move
+                # the cursor first and the next run is addressed again
+                self.cursor_x = end
+                x = end
+
+    def retain(self, string, start, end, cursor_x, cursor_y):
+        """Records characters written to the display outside of commit()."""
+        columns = self.num_columns
+        if not 0 <= cursor_y < self.num_lines or cursor_x >= columns:
+            return
+        end = min(end, start + columns - cursor_x)
+        i = cursor_y * columns + cursor_x
+        for char in string[start:end]:
+            self.shadow[i] = self.pending[i] = ord(char)
+            i += 1
 
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
@@ -149,12 +273,38 @@ class LcdApi:
         """
         location &= 0x7
         self.hal_write_command(self.LCD_CGRAM | (location << 3))
-        self.hal_sleep_us(40)
+        self.busy_for(40)
         for i in range(8):
             self.hal_write_data(charmap[i])
-            self.hal_sleep_us(40)
+            self.busy_for(40)
         self.move_to(self.cursor_x, self.cursor_y)
 
+    def busy_for(self, usecs):
+        """Marks the LCD as busy for the next usecs microseconds."""
+        self.busy_until = time.ticks_add(time.ticks_us(), usecs)
+        self.busy = True
+
+    def busy_remaining_us(self):
+        """Returns how many microseconds the LCD is still busy for."""
+        if not self.busy:
+            return 0
+        remaining = time.ticks_diff(self.busy_until, time.ticks_us())
+        if remaining <= 0:
+            self.busy = False
+            return 0
+        return remaining
+
+    def wait_ready(self):
+        """Waits until the LCD is no longer busy.
+
+        A HAL class calls this before every write to the LCD.
+        """
+        if self.busy:
+            remaining = self.busy_remaining_us()
+            if remaining:
+                self.hal_sleep_us(remaining)
+                self.busy = False
+
     def hal_backlight_on(self):
         """Allows the hal layer to turn the backlight on.
 
@@ -173,7 +323,8 @@ class LcdApi:
         """Write a command to the LCD.
 
         It is expected that a derived HAL class will implement this
-        function.
+        function, calling wait_ready() before the write and busy_for()
+        after commands that take longer than the write itself.
         """
         raise NotImplementedError
 
@@ -181,10 +332,20 @@ class LcdApi:
         """Write data to the LCD.
 
         It is expected that a derived HAL class will implement this
-        function.
+        function, calling wait_ready() before the write.
         """
         raise NotImplementedError
 
+    def hal_write_string(self, string, start, end):
+        """Write the characters string[start:end] to the LCD. string is a
+        str or, for commit(), a bytearray of character codes.
+
+        A derived HAL class can override this with a faster bulk transfer.
+        """
+        chars = isinstance(string, str)
+        for i in range(start, end):
+            self.hal_write_data(ord(string[i]) if chars else string[i])
+
     def hal_sleep_us(self, usecs):
         """Sleep for some time (given in microseconds)."""
         time.sleep_us(usecs)
@@ -0,0 +1,52 @@
+import uasyncio as asyncio
+
+
+class AsyncLcd:
+    """Drives an LcdApi from uasyncio tasks.
+
+    Where LcdApi would block in the next write until a slow command such
+    as clear() has finished, AsyncLcd sleeps and lets other tasks run, so
+    the LCD can be updated next to the OLED without frame hitches.
+    """
+
+    def __init__(self, lcd):
+        self.lcd = lcd
+
+    async def ready(self):
+        """Returns once the LCD accepts the next write."""
+        remaining = self.lcd.busy_remaining_us()
+        if remaining:
+            await asyncio.sleep_ms((remaining + 999) // 1000)
+
+    async def clear(self):
+        await self.ready()
+        self.lcd.clear()
+
+    async def move_to(self, cursor_x, cursor_y):
+        await self.ready()
+        self.lcd.move_to(cursor_x, cursor_y)
+
+    async def putchar(self, char):
+        await self.ready()
+        self.lcd.putchar(char)
+
+    async def putstr(self, string):
+        await self.ready()
+        self.lcd.putstr(string)
+
+    def write_at(self, cursor_x, cursor_y, text):
+        # only touches the pending buffer, nothing to wait for
+        self.lcd.write_at(cursor_x, cursor_y, text)
+
+    async def commit(self):
+        await self.ready()
+        self.lcd.commit()
+
+    async def custom_char(self, location, charmap):
+        await self.ready()
+        self.lcd.custom_char(location, charmap)
+
+    async def command(self, cmd):
+        """Sends a raw command, for those without a LcdApi method."""
+        await self.ready()
+        self.lcd.hal_write_command(cmd)
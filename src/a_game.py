@@ -1,12 +1,34 @@
+import array
+import framebuf
 import machine
 
 from machine import Pin, I2C, PWM
 
-import sh1106
+import manifest
 import math
-import time
+import utime as time
+from runtime import AsyncRuntime, LedEffect
+from pipeline import RenderPipeline
+from glyphs import TextCache
+from startup import profile
+from profiler import allocations, profiler
+from sprites import NumberSprite, Sprite, SpriteLayer, TextSprite
 
 TICKS_PER_SECOND: int = 30
+# transmit frames to the display from the second core
+RENDER_ON_SECOND_CORE: bool = False
+# print tick and render statistics every 10 seconds. Building the report
+# allocates, so it is off unless asked for, PROFILE_FRAMES and
+# ALLOCATION_BUDGET turn it on as well, they are printed with it
+REPORT_FRAMES: bool = False
+# per phase tick, render and show times, printed with the runtime's report
+PROFILE_FRAMES: bool = False
+# file the presses are logged to at every game over, for replaying games
+# with bench/simulate.py --replay
+RECORD_PRESSES_TO: str = None
+# bytes tick, draw and show may allocate per frame, when set the calls
+# over it are counted and printed with the runtime's report
+ALLOCATION_BUDGET: int = None
 
 
 def ticks_to_seconds_left(value: int) -> int:
@@ -29,12 +51,183 @@ def scan(i2c: I2C):
 
 
 class Button:
-    def __init__(self, pin: Pin):
+    """A debounced button read from pin interrupts.
+
+    Every accepted edge is stored with its ticks_us time in a preallocated
+    ring buffer, so phases see each press and when it happened, however
+    short it was and however late the tick is. The first edge is taken
+    at once, further edges within debounce_us of it are contact bounce.
+    """
+    EDGES = 16
+
+    def __init__(self, pin: Pin, debounce_us: int = 10000):
         self.pin = pin
+        self.debounce_us: int = debounce_us
+        self.pressed: bool = not pin.value()  # it is inverted
+        self.changed_at: int = time.ticks_add(time.ticks_us(), -debounce_us)
+        self.edge_at = array.array("i", [0] * Button.EDGES)
+        self.edge_pressed = bytearray(Button.EDGES)
+        # the interrupt only moves head, the phases only move tail
+        self.head: int = 0
+        self.tail: int = 0
+        self.overflows: int = 0
+        pin.irq(self.on_edge, Pin.IRQ_FALLING | Pin.IRQ_RISING)
+
+    def on_edge(self, pin: Pin) -> None:
+        # runs as an interrupt handler, must not allocate
+        now = time.ticks_us()
+        pressed = not pin.value()
+        if pressed == self.pressed or time.ticks_diff(now, self.changed_at) < self.debounce_us:
+            return
+        self.record(pressed, now)
+
+    def record(self, pressed: bool, at: int) -> None:
+        self.pressed = pressed
+        self.changed_at = at
+        head = self.head
+        following = (head + 1) % Button.EDGES
+        if following == self.tail:
+            self.overflows += 1
+            return
+        self.edge_at[head] = at
+        self.edge_pressed[head] = pressed
+        self.head = following
+
+    def settle(self) -> None:
+        # an edge ignored as bounce can have been the last one, catch up
+        # with the pin once the debounce window is over
+        state = machine.disable_irq()
+        now = time.ticks_us()
+        pressed = not self.pin.value()
+        if pressed != self.pressed and time.ticks_diff(now, self.changed_at) >= self.debounce_us:
+            self.record(pressed, now)
+        machine.enable_irq(state)
+
+    def is_pressed(self) -> bool:
+        self.settle()
+        return self.pressed
+
+    def pop_press(self) -> int:
+        """Returns the ticks_us time of the oldest press not taken yet,
+        or -1 if there is none. Releases are skipped."""
+        if self.tail == self.head:
+            self.settle()
+        while self.tail != self.head:
+            tail = self.tail
+            self.tail = (tail + 1) % Button.EDGES
+            if self.edge_pressed[tail]:
+                return self.edge_at[tail]
+        return -1
+
+    def clear(self) -> None:
+        """Drops the edges no phase has taken."""
+        self.tail = self.head
+
+
+class PressLog:
+    """Button presses by game tick, for replaying a game.
+
+    A press is stored as the tick it was taken in and its time relative to
+    that tick, which is negative as presses are taken after they happen.
+    InGame places a press between its previous tick and this one, so for
+    presses taken in InGame the time between the two ticks is stored too,
+    and a replay runs that tick after as long. It is 0 in other phases. The
+    log holds `size` presses, later ones are counted as lost.
+    """
+
+    def __init__(self, size: int = 256):
+        self.ticks = array.array("i", [0] * size)
+        self.offsets = array.array("i", [0] * size)
+        self.durations = array.array("i", [0] * size)
+        self.count: int = 0
+        self.lost: int = 0
+
+    def add(self, tick: int, offset_us: int, duration_us: int = 0) -> None:
+        if self.count == len(self.ticks):
+            self.lost += 1
+            return
+        self.ticks[self.count] = tick
+        self.offsets[self.count] = offset_us
+        self.durations[self.count] = duration_us
+        self.count += 1
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            for i in range(self.count):
+                f.write("{} {} {}\n".format(self.ticks[i], self.offsets[i], self.durations[i]))
 
-    def is_pressed(self):
-        a = self.pin.value()
-        return not a  # it is inverted
+    @staticmethod
+    def load(path: str, size: int = 256) -> "PressLog":
+        log = PressLog(size)
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if fields:
+                    # logs without durations replay at the nominal tick rate
+                    log.add(int(fields[0]), int(fields[1]),
+                            int(fields[2]) if len(fields) > 2 else 0)
+        return log
+
+
+class RecordingInput:
+    """Passes the presses of another input on and adds them to a PressLog."""
+
+    def __init__(self, source, game: "Game", log: PressLog):
+        self.source = source
+        self.game = game
+        self.log = log
+
+    def pop_press(self) -> int:
+        pressed_at = self.source.pop_press()
+        if pressed_at >= 0:
+            phase = self.game.phase
+            if isinstance(phase, InGame):
+                self.log.add(self.game.ticks, time.ticks_diff(pressed_at, phase.tick_at),
+                             time.ticks_diff(phase.tick_at, phase.previous_tick_at))
+            else:
+                self.log.add(self.game.ticks, time.ticks_diff(pressed_at, time.ticks_us()))
+        return pressed_at
+
+    def clear(self) -> None:
+        self.source.clear()
+
+
+class ReplayInput:
+    """Presses from a PressLog, each in the tick it was recorded in.
+
+    The presses land where they did only if the ticks they are taken in
+    start duration_us() after the tick before, the caller sets the clock.
+    """
+
+    def __init__(self, log: PressLog, game: "Game"):
+        self.log = log
+        self.game = game
+        self.next: int = 0
+
+    def pop_press(self) -> int:
+        log = self.log
+        if self.next < log.count and log.ticks[self.next] <= self.game.ticks:
+            offset_us = log.offsets[self.next]
+            self.next += 1
+            phase = self.game.phase
+            if isinstance(phase, InGame):
+                return time.ticks_add(phase.tick_at, offset_us)
+            return time.ticks_add(time.ticks_us(), offset_us)
+        return -1
+
+    def duration_us(self, tick: int) -> int:
+        """Time between the tick before and `tick` when it was recorded,
+        0 if no press of it needs it."""
+        log = self.log
+        if self.next < log.count and log.ticks[self.next] == tick:
+            return log.durations[self.next]
+        return 0
+
+    def clear(self) -> None:
+        # presses of this tick the phase did not take were dropped as well
+        log = self.log
+        while self.next < log.count and log.ticks[self.next] <= self.game.ticks:
+            self.next += 1
 
 
 SCREEN_WIDTH = 128
@@ -62,7 +255,7 @@ class RGBLed:
         self.green_pwm.duty_u16(65535 - green)
         self.blue_pwm.duty_u16(65535 - blue)
         
-    def set_color(self, colors: Tuple[float, float, float]) -> None:
+    def set_color(self, colors: tuple) -> None:
         red = round(colors[0] * 65535)
         green = round(colors[1] * 65535)
         blue = round(colors[2] * 65535)
@@ -78,32 +271,36 @@ class Rating:
     PERFECT = 3
     AWESOME = 4
 
+    NAMES = {
+        ARE_YOU_SERIOUS: "Are you SERIOUS?",
+        NOT_CLOSE: "Not even close",
+        OK: "Ok, I take it",
+        PERFECT: "Perfect!",
+        AWESOME: "AWESOME!",
+    }
+
     @staticmethod
     def str_value(rating_value):
-        rating_map = {
-            Rating.ARE_YOU_SERIOUS: "Are you SERIOUS?",
-            Rating.NOT_CLOSE: "Not even close",
-            Rating.OK: "Ok, I take it",
-            Rating.PERFECT: "Perfect!",
-            Rating.AWESOME: "AWESOME!",
-        }
-        return rating_map.get(rating_value, str(rating_value))
+        name = Rating.NAMES.get(rating_value)
+        if name is None:
+            return str(rating_value)
+        return name
+
+
+# the bonus for a press `MIDDLE_X // 2 - n` pixels from the wall is
+# BONUS[n], worked out once so rating a press needs no float math
+BONUS = tuple(round(score ** 1.5 / 8) for score in range(MIDDLE_X // 2 + 1))
 
 
 class GamePhase:
-    def tick(self, button: Button) -> Bool:
+    def tick(self, button: Button) -> bool:
         raise NotImplementedError("must be defined by GamePhases")
 
 
 class MainMenu(GamePhase):
-    def __init__(self):
-        self.was_pressed = True
-
     def tick(self, button: Button):
-        is_pressed = button.is_pressed()
-        if is_pressed and not self.was_pressed:
+        if button.pop_press() >= 0:
             return True
-        self.was_pressed = is_pressed
 
 
 class CountDown(GamePhase):
@@ -119,7 +316,6 @@ class CountDown(GamePhase):
 
 class InGame(GamePhase):
     def __init__(self):
-        self.button_was_down_last_tick: bool = True
         self.direction_x: int = 1
         self.direction_y: int = 1
         self.speed: int = 2
@@ -136,6 +332,10 @@ class InGame(GamePhase):
         self.rating_direction: int = 1
         self.rating_count: int = 0
         self.ticks_left: int = TICKS_PER_SECOND * 20
+        # where the ball was at the previous tick, for interpolating presses
+        self.previous_x: int = self.x
+        self.previous_tick_at: int = time.ticks_us()
+        self.tick_at: int = self.previous_tick_at
 
     def check_bounce_against_walls(self) -> None:
         next_x: int = self.x + self.direction_x * self.speed
@@ -156,11 +356,23 @@ class InGame(GamePhase):
             next_y = self.upper_side
         self.y = next_y
 
-    def distance_to_cloest_wall(self) -> int:
-        distance_to_left = self.x - self.left_side
-        distance_to_right = self.right_side - self.x
+    def distance_to_cloest_wall(self, x: int = None) -> int:
+        if x is None:
+            x = self.x
+        distance_to_left = x - self.left_side
+        distance_to_right = self.right_side - x
         return min(distance_to_left, distance_to_right)
 
+    def x_at(self, at: int) -> int:
+        # The ball moves from previous_x to x between the previous tick and
+        # this one. Bounces stop it at the wall, so the path is a straight line.
+        duration = time.ticks_diff(self.tick_at, self.previous_tick_at)
+        if duration <= 0:
+            return self.x
+        elapsed = min(max(time.ticks_diff(at, self.previous_tick_at), 0), duration)
+        # rounded to the nearest pixel
+        return self.previous_x + ((self.x - self.previous_x) * elapsed * 2 + duration) // (duration * 2)
+
     @staticmethod
     def rating_from_distance_to_wall(distance: int) -> Rating:
         if distance > 25:
@@ -178,23 +390,24 @@ class InGame(GamePhase):
         self.direction_y = -self.direction_y
         self.ball_bounced()
 
-    def rate_button_press(self) -> None:
-        wall_distance = self.distance_to_cloest_wall()
-        score: int = round(MIDDLE_X / 2 - wall_distance)
+    def rate_button_press(self, pressed_at: int) -> None:
+        x = self.x_at(pressed_at)
+        wall_distance = self.distance_to_cloest_wall(x)
+        score: int = MIDDLE_X // 2 - wall_distance
         if score > 0:
-            score = round(score ** 1.5 / 8)
+            score = BONUS[score]
         self.last_bonus_given = score
         self.score += score
         self.last_rating = InGame.rating_from_distance_to_wall(wall_distance)
         self.rating_count += 1
-        self.rating_direction = -1 if self.x <= MIDDLE_X else 1
+        self.rating_direction = -1 if x <= MIDDLE_X else 1
 
     def allowed_to_be_rated(self) -> bool:
         return self.rating_direction == 0
 
-    def button_went_down(self):
+    def button_went_down(self, pressed_at: int):
         if self.allowed_to_be_rated():
-            self.rate_button_press()
+            self.rate_button_press(pressed_at)
         else:
             print("not allowed to be rated", self.x, self.rating_direction)
 
@@ -208,43 +421,53 @@ class InGame(GamePhase):
         if self.ticks_left % self.speed_increase_every == 0:
             self.speed += 1
 
-    def check_if_button_is_pressed(self):
-        button_is_pressed_now = button.is_pressed()
-        if button_is_pressed_now and not self.button_was_down_last_tick:
-            self.button_went_down()
-        self.button_was_down_last_tick = button_is_pressed_now
+    def check_if_button_is_pressed(self, button: Button):
+        pressed_at = button.pop_press()
+        while pressed_at >= 0:
+            self.button_went_down(pressed_at)
+            pressed_at = button.pop_press()
 
     def tick(self, button: Button):
         if self.ticks_left == 0:
             return True
         self.ticks_left -= 1
 
+        self.previous_x = self.x
+        self.previous_tick_at = self.tick_at
+        self.tick_at = time.ticks_us()
         self.check_bounce_against_walls()
         self.check_if_allowed_to_be_rated_again()
         self.check_if_speed_should_increase()
-        self.check_if_button_is_pressed()
+        self.check_if_button_is_pressed(button)
 
 
 class GameOver(GamePhase):
     def __init__(self, score: int):
         self.score = score
-        self.was_pressed = True
         self.ticks_left: int = TICKS_PER_SECOND * 1
 
     def tick(self, button: Button):
         if self.ticks_left == 0:
-            is_pressed = button.is_pressed()
-            if is_pressed and not self.was_pressed:
+            if button.pop_press() >= 0:
                 return True
-            self.was_pressed = is_pressed
         else:
             self.ticks_left -= 1
 
 
 class Game:
+    """The game logic, without any hardware.
+
+    tick() takes the input to read presses from: a Button on the board, a
+    ReplayInput or a scripted player elsewhere. Phases read the time with
+    utime, which the host emulator can run on a virtual clock, so whole
+    games can be simulated much faster than real time (bench/simulate.py).
+    """
+
     def __init__(self):
         self.is_over: bool = False
         self.phase = MainMenu()
+        # ticks since the start, the clock of PressLog
+        self.ticks: int = 0
 
     def switch_phase(self) -> GamePhase:
         phase: GamePhase = self.phase
@@ -260,117 +483,227 @@ class Game:
             return "Unknown type"
 
     def tick(self, button: Button):
-        is_done: Bool = self.phase.tick(button)
+        self.ticks += 1
+        phase = self.phase
+        if profiler.enabled:
+            is_done: bool = profiler.measure(type(phase).__name__, phase.tick, button)
+        else:
+            is_done: bool = phase.tick(button)
+        # presses the phase did not want, e.g. during the count down, must
+        # not carry over into a later tick
+        button.clear()
         if is_done:
             self.phase = self.switch_phase()
 
 
 class RenderPhase:
-    def __init__(self, display: SH1106_I2C, rgb_led: RGBLed=None):
+    def __init__(self, display: framebuf.FrameBuffer, text: TextCache, background: bytearray,
+                 rgb_led: RGBLed=None):
         self.display = display
+        self.text = text
+        self.sprites = SpriteLayer(display, background)
+
+    def enter(self, phase: GamePhase) -> None:
+        # the phase objects are made once and reused, this starts them over
+        self.sprites.reset()
+
+    def close(self) -> None:
+        pass
+
+    def draw_background(self, phase: GamePhase) -> None:
+        # what stays the same for the whole phase, drawn once when it starts
+        pass
+
+    def render(self, phase: GamePhase) -> None:
+        # updates the sprites, which are drawn on top of the background
+        pass
 
-    def tick(self, button: Button) -> Bool:
-        raise NotImplementedError("must be defined by GamePhases")
+
+def duty_cycles(red: float, green: float, blue: float) -> tuple:
+    return (round(red * 65535), round(green * 65535), round(blue * 65535))
 
 
 class RenderInGame(RenderPhase):
-    def __init__(self, display: SH1106_I2C, rgb_led: RGBLed):
-        self.display = display
+    # PWM duty cycles of the LED per rating
+    LED_COLORS = {
+        Rating.ARE_YOU_SERIOUS: duty_cycles(1, 0.1, 0.1),
+        Rating.NOT_CLOSE: duty_cycles(0.5, 0.3, 0.3),
+        Rating.OK: duty_cycles(0.4, 0.4, 0.1),
+        Rating.PERFECT: duty_cycles(0.1, 0.5, 0.1),
+        Rating.AWESOME: duty_cycles(0.1, 1, 0.1),
+    }
+
+    def __init__(self, display: framebuf.FrameBuffer, text: TextCache, background: bytearray,
+                 rgb_led: RGBLed):
+        super().__init__(display, text, background, rgb_led)
         self.rgb_led = rgb_led
         self.last_shown_rating_count: int = 0
-        self.show_rating_timer: int = 0
+        self.is_showing_rating: bool = False
+        self.hide_rating_at: int = 0
+        sprites = self.sprites
+        self.ball = sprites.add(Sprite(BALL_SIZE, BALL_SIZE))
+        self.score = sprites.add(NumberSprite(text))
+        self.rating = sprites.add(TextSprite(text, Rating.str_value(Rating.OK), 0, 5))
+        bonus_label = sprites.add(TextSprite(text, "bonus:", 14, 22))
+        self.bonus = sprites.add(NumberSprite(text, 0, bonus_label.x + bonus_label.width, 22))
+        ticks_label = sprites.add(TextSprite(text, "Time Left ", 10, 38))
+        self.ticks_left = sprites.add(NumberSprite(text, 0, ticks_label.x + ticks_label.width, 38))
+        self.rating_sprites = (self.rating, bonus_label, self.bonus)
+        self.ticks_left_sprites = (ticks_label, self.ticks_left)
+
+    def enter(self, ingame: InGame) -> None:
+        super().enter(ingame)
+        self.last_shown_rating_count = 0
+        self.is_showing_rating = False
+        self.hide_rating_at = 0
+        for sprite in self.rating_sprites + self.ticks_left_sprites:
+            sprite.hide()
+        # rendered now, not when a rating is first shown during the game
+        for name in Rating.NAMES.values():
+            self.text.glyph(name)
+
+    @staticmethod
+    def set_visible(sprites: tuple, visible: bool) -> None:
+        for sprite in sprites:
+            if visible:
+                sprite.show()
+            else:
+                sprite.hide()
 
     def render_rating(self, rating: Rating, score_given: int):
-        self.display.text(Rating.str_value(rating), 0, 5, 1)
-        self.display.text("bonus:" + str(score_given), 14, 22, 1)
+        self.rating.set_text(Rating.str_value(rating))
+        self.bonus.set_value(score_given)
 
     def render_score(self, score: int) -> None:
-        self.display.text("Score " + str(score), 30, 48, 1)
+        self.score.set_value(score)
 
     def render_ticks_left(self, ticks: int) -> None:
-        self.display.text("Time Left " + str(ticks), 10, 38, 1)
+        self.ticks_left.set_value(ticks)
         
     def set_led_color_from_rating(self, rating: Rating):
-        if rating == Rating.ARE_YOU_SERIOUS:
-            color = (1, 0.1, 0.1)
-        elif rating == Rating.NOT_CLOSE:
-            color = (0.5, 0.3, 0.3)
-        elif rating == Rating.OK:
-            color = (0.4,0.4,0.1)
-        elif rating == Rating.PERFECT:
-            color = (0.1,0.5,0.1)
-        elif rating == Rating.AWESOME:
-            color = (0.1, 1, 0.1)
-            
-        self.rgb_led.set_color(color)
+        (red, green, blue) = RenderInGame.LED_COLORS[rating]
+        self.rgb_led.set_values(red, green, blue)
+
+    def draw_background(self, ingame: InGame) -> None:
+        x = self.text.text(self.display, "Score ", 30, 48)
+        self.score.move_to(x, 48)
+        self.display.vline(0, 0, 64, 1)
+        self.display.vline(127, 0, 64, 1)
 
     def render(self, ingame: InGame):
         # self.display.text('Hello World!', 128 - ingame.x, 32, 1)
         if self.last_shown_rating_count != ingame.rating_count:
-            self.show_rating_timer = TICKS_PER_SECOND * 0.5
+            # measured in game ticks, since renders can be dropped by the scheduler
+            self.hide_rating_at = ingame.ticks_left - TICKS_PER_SECOND // 2
+            self.is_showing_rating = True
             self.last_shown_rating_count = ingame.rating_count
             self.set_led_color_from_rating(ingame.last_rating)
 
-        if self.show_rating_timer > 0:
-            self.show_rating_timer -= 1
-            if self.show_rating_timer == 0:
+        if self.is_showing_rating:
+            if ingame.ticks_left <= self.hide_rating_at:
+                self.is_showing_rating = False
                 self.rgb_led.turn_off()
-            self.render_rating(ingame.last_rating, ingame.last_bonus_given)
-            
+            else:
+                self.render_rating(ingame.last_rating, ingame.last_bonus_given)
+        self.set_visible(self.rating_sprites, self.is_showing_rating)
+
         self.render_score(ingame.score)
 
         if ingame.ticks_left < 100:
             self.render_ticks_left(ingame.ticks_left)
+        self.set_visible(self.ticks_left_sprites, ingame.ticks_left < 100)
 
-        self.display.vline(0, 0, 64, 1)
-        self.display.vline(127, 0, 64, 1)
-        self.display.fill_rect(ingame.x, ingame.y, BALL_SIZE, BALL_SIZE, 1)
+        self.ball.move_to(ingame.x, ingame.y)
         
     def close(self):
         self.rgb_led.turn_off()
 
 
 class RenderMainMenu(RenderPhase):
-    def render(self, main: MainMenu):
-        self.display.text("Reaction Game", 15, 20, 1)
-        self.display.text("press button", 12, 52, 1)
+    def draw_background(self, main: MainMenu) -> None:
+        self.text.text(self.display, "Reaction Game", 15, 20)
+        self.text.text(self.display, "press button", 12, 52)
 
 
 class RenderGameOver(RenderPhase):
+    def __init__(self, display: framebuf.FrameBuffer, text: TextCache, background: bytearray):
+        super().__init__(display, text, background)
+        self.press_button = self.sprites.add(TextSprite(text, "press button", 12, 52))
+
+    def enter(self, game_over: GameOver) -> None:
+        super().enter(game_over)
+        self.press_button.hide()
+
+    def draw_background(self, game_over: GameOver) -> None:
+        self.text.text(self.display, "GAME OVER", 30, 20)
+        x = self.text.text(self.display, "Score ", 32, 34)
+        self.text.number(self.display, game_over.score, x, 34)
+
     def render(self, game_over: GameOver) -> None:
-        self.display.text("GAME OVER", 30, 20, 1)
-        self.display.text("Score " + str(game_over.score), 32, 34, 1)
         if game_over.ticks_left == 0:
-            self.display.text("press button", 12, 52, 1)
+            self.press_button.show()
 
 
 class RenderCountDown(RenderPhase):
+    def __init__(self, display: framebuf.FrameBuffer, text: TextCache, background: bytearray):
+        super().__init__(display, text, background)
+        self.seconds = self.sprites.add(NumberSprite(text, 0, 60, 35))
+
+    def draw_background(self, count_down: CountDown) -> None:
+        self.text.text(self.display, "Get Ready!", 20, 12)
+
     def render(self, count_down: CountDown):
-        self.display.text("Get Ready!", 20, 12, 1)
-        self.display.text(str(ticks_to_seconds(count_down.count_down)), 60, 35, 1)
+        self.seconds.set_value(ticks_to_seconds(count_down.count_down))
 
 
 class Render:
-    def __init__(self, display: SH1106_I2C, rgb_led: RGBLed):
+    def __init__(self, display: framebuf.FrameBuffer, rgb_led: RGBLed):
         self.display = display
         self.rgb_led = rgb_led
+        # shared by the phases, so strings of the previous phase stay cached
+        self.text = TextCache()
+        # the background of the current phase, the sprites are erased to it
+        self.background = bytearray((display.height + 7) // 8 * display.width)
+        # made once, with their sprites, and entered again every game
+        self.main_menu = RenderMainMenu(display, self.text, self.background)
+        self.count_down = RenderCountDown(display, self.text, self.background)
+        self.in_game = RenderInGame(display, self.text, self.background, rgb_led)
+        self.game_over = RenderGameOver(display, self.text, self.background)
         self.phase: RenderPhase = None
 
-    def switch_render_phase_if_needed(self, phase: GamePhase):
-        if isinstance(phase, MainMenu) and not isinstance(self.phase, RenderMainMenu):
-            self.phase = RenderMainMenu(self.display)
-        elif isinstance(phase, CountDown) and not isinstance(self.phase, RenderCountDown):
-            self.phase = RenderCountDown(self.display)
-        elif isinstance(phase, InGame) and not isinstance(self.phase, RenderInGame):
-            self.phase = RenderInGame(self.display, self.rgb_led)
-        elif isinstance(phase, GameOver) and not isinstance(self.phase, RenderGameOver):
+    def switch_render_phase_if_needed(self, phase: GamePhase) -> bool:
+        if isinstance(phase, MainMenu):
+            next_phase = self.main_menu
+        elif isinstance(phase, CountDown):
+            next_phase = self.count_down
+        elif isinstance(phase, InGame):
+            next_phase = self.in_game
+        else:
+            next_phase = self.game_over
+        if next_phase is self.phase:
+            return False
+        if self.phase is not None:
             self.phase.close()
-            self.phase = RenderGameOver(self.display)
+        self.phase = next_phase
+        next_phase.enter(phase)
+        return True
+
+    def draw(self, phase: GamePhase):
+        if self.switch_render_phase_if_needed(phase):
+            self.display.fill(0)
+            self.phase.draw_background(phase)
+            self.display.save_frame(self.background)
+        if profiler.enabled:
+            profiler.measure(type(self.phase).__name__, self.draw_phase, phase)
+        else:
+            self.draw_phase(phase)
 
-    def render(self, phase: GamePhase):
-        self.display.fill(0)
-        self.switch_render_phase_if_needed(phase)
+    def draw_phase(self, phase: GamePhase):
         self.phase.render(phase)
+        self.phase.sprites.draw()
+
+    def render(self, phase: GamePhase):
+        self.draw(phase)
         self.display.show()
 
 
@@ -379,30 +712,72 @@ def initialize_i2c(sda_pin: Pin, scl_pin: Pin) -> I2C:
     return i2c
 
 
-def initialize_display() -> SH1106_I2C:
-    display: SH1106_I2C = sh1106.SH1106_I2C(128, 64, i2c)
-    display.sleep(False)
+def initialize_display(i2c: I2C) -> framebuf.FrameBuffer:
+    # the driver manifest.py names, already imported by the loader, so only
+    # that driver is ever loaded
+    driver = getattr(__import__(manifest.DISPLAY), manifest.DISPLAY_CLASS)
+    display: framebuf.FrameBuffer = driver(128, 64, i2c, retained=True)
     return display
 
 
-# All pins used on the board. I2C is for the display
-i2c_sda_pin = Pin(2)
-i2c_scl_pin = Pin(3)
-rgb_led_red_pin = Pin(10)
-rgb_led_green_pin = Pin(11)
-rgb_led_blue_pin = Pin(12)
-button_pin = Pin(13, Pin.IN, Pin.PULL_UP)
-# --------------------------
-
-i2c = initialize_i2c(i2c_sda_pin, i2c_scl_pin)
-display = initialize_display()
-button = Button(button_pin)
-rgb_led = RGBLed(rgb_led_red_pin, rgb_led_green_pin, rgb_led_blue_pin)
-
-# scan(i2c)
-game = Game()
-render = Render(display, rgb_led)
-
-while not game.is_over:
-    game.tick(button)
+def main():
+    # All pins used on the board. I2C is for the display
+    i2c_sda_pin = Pin(2)
+    i2c_scl_pin = Pin(3)
+    rgb_led_red_pin = Pin(10)
+    rgb_led_green_pin = Pin(11)
+    rgb_led_blue_pin = Pin(12)
+    button_pin = Pin(13, Pin.IN, Pin.PULL_UP)
+    # --------------------------
+
+    i2c = initialize_i2c(i2c_sda_pin, i2c_scl_pin)
+    profile.stage("i2c")
+    display = initialize_display(i2c)
+    profile.stage("display")
+    button = Button(button_pin)
+    profile.stage("button")
+    led_effect = LedEffect(RGBLed(rgb_led_red_pin, rgb_led_green_pin, rgb_led_blue_pin))
+    profile.stage("rgb led")
+
+    # scan(i2c)
+    if RENDER_ON_SECOND_CORE:
+        pipeline = RenderPipeline(display)
+        pipeline.start()
+        # drawing goes to the back buffer, its show() hands it to core 1
+        display = pipeline.back
+        profile.stage("pipeline")
+    game = Game()
+    presses = None
+    if RECORD_PRESSES_TO:
+        presses = PressLog()
+        button = RecordingInput(button, game, presses)
+    render = Render(display, led_effect)
+    runtime = AsyncRuntime(TICKS_PER_SECOND)
+    profiler.enabled = PROFILE_FRAMES
+    if ALLOCATION_BUDGET is not None:
+        allocations.budget = ALLOCATION_BUDGET
+        allocations.enabled = True
+    report = REPORT_FRAMES or PROFILE_FRAMES or allocations.enabled
+    profile.stage("game")
     render.render(game.phase)
+    profile.stage("first frame")
+    profile.report()
+
+    def tick():
+        was_over = isinstance(game.phase, GameOver)
+        game.tick(button)
+        if presses is not None and not was_over and isinstance(game.phase, GameOver):
+            presses.save(RECORD_PRESSES_TO)
+
+    runtime.run(
+        tick,
+        lambda: render.draw(game.phase),
+        display,
+        lambda: game.is_over,
+        tasks=(led_effect.run(),),
+        report_every=TICKS_PER_SECOND * 10 if report else 0,
+    )
+
+
+if __name__ == "__main__":
+    main()
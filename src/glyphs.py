@@ -0,0 +1,106 @@
+import framebuf
+
+# the 8x8 font of framebuf.text()
+CHAR_SIZE = 8
+DIGITS = "0123456789-"
+
+
+class Glyph(framebuf.FrameBuffer):
+    """A pre-rendered MONO_VLSB bitmap.
+
+    Exposes width and height so display drivers mark exactly the area a
+    blit() covers as dirty.
+    """
+
+    def __init__(self, buffer, width: int, height: int = CHAR_SIZE):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.used = 0
+        super().__init__(buffer, width, height, framebuf.MONO_VLSB)
+
+
+class TextCache:
+    """Draws text by blitting bitmaps rendered once per distinct string.
+
+    Strings are keyed by content, at most `capacity` of them are kept and
+    the least recently drawn one is dropped to make room. Numbers go through
+    number(), which blits digits from a fixed atlas and never builds a string.
+
+    Like framebuf.text(), only set pixels are drawn, in `color`.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self.glyphs = {}
+        self.clock = 0
+        # one 8x8 cell per character of DIGITS, in a single buffer
+        self.atlas = bytearray(CHAR_SIZE * len(DIGITS))
+        framebuf.FrameBuffer(self.atlas, CHAR_SIZE * len(DIGITS), CHAR_SIZE,
+                             framebuf.MONO_VLSB).text(DIGITS, 0, 0, 1)
+        atlas_mv = memoryview(self.atlas)
+        self.digits = [Glyph(atlas_mv[i * CHAR_SIZE:(i + 1) * CHAR_SIZE], CHAR_SIZE)
+                       for i in range(len(DIGITS))]
+        self.minus = self.digits[10]
+        # blit() compares the key after the palette lookup, so clearing
+        # pixels swaps 0 and 1 and skips what was 0
+        self.inverse = framebuf.FrameBuffer(bytearray(b'\x01'), 2, 1, framebuf.MONO_HMSB)
+
+    def glyph(self, text: str) -> Glyph:
+        self.clock += 1
+        glyph = self.glyphs.get(text)
+        if glyph is None:
+            if len(self.glyphs) >= self.capacity:
+                self.evict()
+            width = CHAR_SIZE * len(text)
+            glyph = Glyph(bytearray(width), width)
+            glyph.text(text, 0, 0, 1)
+            self.glyphs[text] = glyph
+        glyph.used = self.clock
+        return glyph
+
+    def evict(self) -> None:
+        oldest = None
+        used = self.clock
+        for text, glyph in self.glyphs.items():
+            if glyph.used < used:
+                oldest, used = text, glyph.used
+        del self.glyphs[oldest]
+
+    def text(self, display, text: str, x: int, y: int, color: int = 1) -> int:
+        """Draws `text` at x, y and returns the x just past it."""
+        glyph = self.glyph(text)
+        self.draw(display, glyph, x, y, color)
+        return x + glyph.width
+
+    def number(self, display, value: int, x: int, y: int, color: int = 1) -> int:
+        """Draws the decimal `value` at x, y and returns the x just past it."""
+        if value < 0:
+            self.draw(display, self.minus, x, y, color)
+            x += CHAR_SIZE
+            value = -value
+        scale = 1
+        while scale * 10 <= value:
+            scale *= 10
+        while scale:
+            self.draw(display, self.digits[value // scale % 10], x, y, color)
+            x += CHAR_SIZE
+            scale //= 10
+        return x
+
+    def number_width(self, value: int) -> int:
+        """The width number() draws `value` with."""
+        width = CHAR_SIZE
+        if value < 0:
+            width += CHAR_SIZE
+            value = -value
+        while value >= 10:
+            width += CHAR_SIZE
+            value //= 10
+        return width
+
+    def draw(self, display, glyph: Glyph, x: int, y: int, color: int) -> None:
+        if color:
+            display.blit(glyph, x, y, 0)
+        else:
+            display.blit(glyph, x, y, 1, self.inverse)
@@ -0,0 +1,38 @@
+import sys
+
+from startup import profile
+
+
+def use_mpy(directory: str) -> bool:
+    # puts the precompiled modules ahead of the sources on the import path
+    try:
+        import uos as os
+    except ImportError:
+        import os
+    try:
+        os.stat(directory)
+    except OSError:
+        return False
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    return True
+
+
+def load(name: str):
+    """Imports a module and records how long it took and the heap after it."""
+    module = __import__(name)
+    source = getattr(module, "__file__", "")
+    profile.stage(name + (".mpy" if source.endswith(".mpy") else ".py"))
+    return module
+
+
+def run(manifest_name: str = "manifest"):
+    manifest = __import__(manifest_name)
+    use_mpy(manifest.MPY_DIR)
+    profile.stage("manifest")
+    for name in manifest.MODULES:
+        load(name)
+    app = load(manifest.APP)
+    # printed now in case the app fails before its own report
+    profile.report()
+    getattr(app, manifest.ENTRY)()
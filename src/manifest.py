@@ -0,0 +1,30 @@
+# What main.py loads at boot, see loader.py.
+#
+# Modules are imported in this order. List dependencies before the modules
+# that import them, so load time and heap are reported for each module
+# instead of being counted towards the first one that needs it. Files that
+# are not listed, like the drivers of other displays, stay on flash.
+
+# the display driver the app draws to, a module and its I2C class, which
+# a_game constructs. RENDER_ON_SECOND_CORE in a_game needs the SH1106.
+DISPLAY = "sh1106"
+DISPLAY_CLASS = "SH1106_I2C"
+
+MODULES = (
+    DISPLAY,
+    "glyphs",
+    "sprites",
+    "profiler",
+    "scheduler",
+    "runtime",
+    "pipeline",
+)
+
+# imported last, then APP.ENTRY() is called
+APP = "a_game"
+ENTRY = "main"
+
+# host/build_mpy.py compiles the modules above to .mpy files in this
+# directory. It is searched before the sources, so on the board a copied
+# .mpy is used and the .py next to it only serves as a fallback.
+MPY_DIR = "/mpy"
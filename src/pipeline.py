@@ -0,0 +1,111 @@
+import _thread
+import framebuf
+import utime as time
+
+
+class BackBuffer(framebuf.FrameBuffer):
+    """The frame core 0 draws into, show() hands it over to core 1."""
+
+    def __init__(self, pipeline, width: int, height: int, format: int):
+        self.pipeline = pipeline
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(len(pipeline.display.renderbuf))
+        super().__init__(self.buffer, width, height, format)
+
+    def show(self, full_update: bool = False) -> None:
+        self.pipeline.present(full_update)
+
+    def save_frame(self, buffer) -> None:
+        buffer[:] = self.buffer
+
+    def load_frame(self, buffer) -> None:
+        # core 1 sends every frame as a whole, there is nothing to mark
+        self.buffer[:] = buffer
+
+    def restore_rect(self, buffer, x, y, w, h) -> None:
+        # the back buffer is laid out like the display's render buffer
+        self.pipeline.display.copy_rect(self.buffer, buffer, x, y, w, h)
+
+
+class RenderPipeline:
+    """Sends frames to an SH1106 display from the second core.
+
+    Core 0 draws the next frame into `back` while core 1 transmits the
+    previous one, so a frame takes about max(logic, bus) time instead of
+    their sum. present() copies the back buffer to `ready` under `lock`,
+    core 1 takes it from there into the display, so neither core waits for
+    the other longer than a buffer copy. A frame presented before core 1
+    got to the previous one replaces it.
+
+    Core 1 marks the whole display dirty for every frame, use a display in
+    retained mode so only the changed bytes go over the bus.
+    """
+
+    def __init__(self, display):
+        self.display = display
+        if display.rotate90:
+            self.back = BackBuffer(self, display.height, display.width, framebuf.MONO_HMSB)
+        else:
+            self.back = BackBuffer(self, display.width, display.height, framebuf.MONO_VLSB)
+        self.ready = bytearray(len(display.renderbuf))
+        # guards ready and the flags below
+        self.lock = _thread.allocate_lock()
+        # released by present() to wake up core 1
+        self.frame_ready = _thread.allocate_lock()
+        self.frame_ready.acquire()
+        self.pending: bool = False
+        self.full_update: bool = False
+        self.running: bool = False
+        self.stopped: bool = True
+        self.frames_presented: int = 0
+        self.frames_sent: int = 0
+
+    def start(self) -> None:
+        self.running = True
+        self.stopped = False
+        _thread.start_new_thread(self.transmit, ())
+
+    def stop(self) -> None:
+        """Returns once core 1 has sent the last frame and stopped."""
+        self.lock.acquire()
+        self.running = False
+        wake = not self.pending
+        self.lock.release()
+        if wake:
+            self.frame_ready.release()
+        while not self.stopped:
+            time.sleep_ms(1)
+
+    def present(self, full_update: bool = False) -> None:
+        self.lock.acquire()
+        self.ready[:] = self.back.buffer
+        self.full_update = self.full_update or full_update
+        wake = not self.pending
+        self.pending = True
+        self.frames_presented += 1
+        self.lock.release()
+        if wake:
+            self.frame_ready.release()
+
+    def transmit(self) -> None:
+        # runs on core 1
+        display = self.display
+        while True:
+            self.frame_ready.acquire()
+            self.lock.acquire()
+            pending = self.pending
+            full_update = self.full_update
+            if pending:
+                display.renderbuf[:] = self.ready
+            self.pending = False
+            self.full_update = False
+            running = self.running
+            self.lock.release()
+            if pending:
+                display.register_updates(0, display.bufsize)
+                display.show(full_update)
+                self.frames_sent += 1
+            if not running:
+                break
+        self.stopped = True
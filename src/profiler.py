@@ -0,0 +1,191 @@
+import array
+import gc
+import utime as time
+
+
+class Section:
+    """The last `size` durations of one part of the frame, in microseconds."""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.samples = array.array("i", [0] * size)
+        self.index: int = 0
+        self.count: int = 0
+
+    def add(self, us: int) -> None:
+        self.samples[self.index] = us
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def percentiles(self) -> tuple:
+        # (p50, p95, max) of the samples held, allocates a sorted copy
+        held = sorted(self.samples[:min(self.count, len(self.samples))])
+        if not held:
+            return (0, 0, 0)
+        n = len(held)
+        return (held[(n * 50 + 99) // 100 - 1], held[(n * 95 + 99) // 100 - 1], held[-1])
+
+
+class Profiler:
+    """Opt-in durations of the parts of a frame.
+
+    Code that is profiled checks `enabled` once and only then takes the
+    time, so a disabled profiler can stay in production builds:
+
+        if profiler.enabled:
+            result = profiler.measure("InGame", phase.tick, button)
+        else:
+            result = phase.tick(button)
+
+    Every section keeps its last `samples` durations in a ring buffer that
+    is allocated when the section is first seen. dump() prints p50, p95
+    and max per section, or writes them to a file.
+    """
+
+    def __init__(self, samples: int = 128):
+        self.enabled: bool = False
+        self.samples: int = samples
+        self.sections: dict = {}
+        self.order: list = []
+
+    def section(self, name: str) -> Section:
+        section = self.sections.get(name)
+        if section is None:
+            section = Section(name, self.samples)
+            self.sections[name] = section
+            self.order.append(section)
+        return section
+
+    def add(self, name: str, us: int) -> None:
+        self.section(name).add(us)
+
+    def measure(self, name: str, function, argument):
+        """Calls function(argument) and records how long it took."""
+        started = time.ticks_us()
+        result = function(argument)
+        self.section(name).add(time.ticks_diff(time.ticks_us(), started))
+        return result
+
+    def reset(self) -> None:
+        for section in self.order:
+            section.index = 0
+            section.count = 0
+
+    def dump(self, file=None) -> None:
+        """Prints the percentiles, or writes them to `file`, a path or stream."""
+        if isinstance(file, str):
+            with open(file, "w") as stream:
+                self.dump(stream)
+            return
+        lines = ["{:16s} {:>6s} {:>7s} {:>7s} {:>7s}".format("section", "count", "p50", "p95", "max")]
+        for section in self.order:
+            p50, p95, peak = section.percentiles()
+            lines.append("{:16s} {:6d} {:5d}us {:5d}us {:5d}us".format(
+                section.name, section.count, p50, p95, peak))
+        for line in lines:
+            if file is None:
+                print(line)
+            else:
+                file.write(line + "\n")
+
+
+class AllocationSection:
+    """Heap bytes allocated by one part of the frame, per call."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: int = 0
+        self.total: int = 0
+        self.peak: int = 0
+        self.over: int = 0
+
+    def add(self, allocated: int, budget: int) -> None:
+        self.calls += 1
+        self.total += allocated
+        if allocated > self.peak:
+            self.peak = allocated
+        if allocated > budget:
+            self.over += 1
+
+
+class AllocationBudget:
+    """Opt-in heap allocations of the parts of a frame, from gc.mem_alloc().
+
+    Used like Profiler, code checks `enabled` once:
+
+        if allocations.enabled:
+            allocations.measure("tick", game.tick, button)
+
+    A call that allocates more than `budget` bytes counts as over budget.
+    The collector only runs when something allocates, so a call during
+    which the heap shrank allocated as well, it is counted as allocating
+    the whole budget and one byte more. dump() prints bytes per call, the
+    most one call allocated and the calls over budget per section.
+    """
+
+    def __init__(self, budget: int = 0):
+        self.enabled: bool = False
+        self.budget: int = budget
+        self.sections: dict = {}
+        self.order: list = []
+
+    def section(self, name: str) -> AllocationSection:
+        section = self.sections.get(name)
+        if section is None:
+            section = AllocationSection(name)
+            self.sections[name] = section
+            self.order.append(section)
+        return section
+
+    def add(self, name: str, allocated: int) -> None:
+        if allocated < 0:
+            allocated = self.budget + 1
+        self.section(name).add(allocated, self.budget)
+
+    def measure(self, name: str, function, argument):
+        """Calls function(argument) and records how much it allocated."""
+        section = self.section(name)
+        before = gc.mem_alloc()
+        result = function(argument)
+        allocated = gc.mem_alloc() - before
+        if allocated < 0:
+            allocated = self.budget + 1
+        section.add(allocated, self.budget)
+        return result
+
+    def over_budget(self) -> bool:
+        for section in self.order:
+            if section.over:
+                return True
+        return False
+
+    def reset(self) -> None:
+        for section in self.order:
+            section.calls = 0
+            section.total = 0
+            section.peak = 0
+            section.over = 0
+
+    def dump(self, file=None) -> None:
+        """Prints the allocations, or writes them to `file`, a path or stream."""
+        if isinstance(file, str):
+            with open(file, "w") as stream:
+                self.dump(stream)
+            return
+        lines = ["{:16s} {:>6s} {:>9s} {:>7s} {:>6s}".format(
+            "section", "calls", "B/call", "max", "over")]
+        for section in self.order:
+            lines.append("{:16s} {:6d} {:9d} {:6d}B {:6d}".format(
+                section.name, section.calls, section.total // max(1, section.calls),
+                section.peak, section.over))
+        lines.append("budget {} bytes per call".format(self.budget))
+        for line in lines:
+            if file is None:
+                print(line)
+            else:
+                file.write(line + "\n")
+
+
+# shared by the runtime and the game, enable it to start recording
+profiler = Profiler()
+allocations = AllocationBudget()
@@ -0,0 +1,210 @@
+import gc
+import uasyncio as asyncio
+import utime as time
+
+from profiler import allocations, profiler
+from scheduler import FrameStats
+
+
+class LedEffect:
+    """Stands in for a_game.RGBLed in the renderers.
+
+    Renderers only record the wanted color, the PWM duty cycles are
+    written by run(), which shows a new color at once and fades out when
+    turned off.
+    """
+
+    def __init__(self, rgb_led, period_ms: int = 20, fade_ms: int = 300):
+        self.rgb_led = rgb_led
+        self.period_ms: int = period_ms
+        self.fade_step: int = max(1, 256 * period_ms // fade_ms)
+        self.red: int = 0
+        self.green: int = 0
+        self.blue: int = 0
+        self.level: int = 0  # 0..256
+        self.fading: bool = False
+        self.changed: bool = False
+
+    def set_color(self, colors: tuple) -> None:
+        self.set_values(round(colors[0] * 65535), round(colors[1] * 65535),
+                        round(colors[2] * 65535))
+
+    def set_values(self, red: int, green: int, blue: int) -> None:
+        # duty cycles like RGBLed.set_values(), without float math
+        self.red = red
+        self.green = green
+        self.blue = blue
+        self.level = 256
+        self.fading = False
+        self.changed = True
+
+    def turn_off(self) -> None:
+        self.fading = self.level > 0
+
+    def update(self) -> None:
+        if self.fading:
+            self.level = max(0, self.level - self.fade_step)
+            self.fading = self.level > 0
+            self.changed = True
+        if self.changed:
+            level = self.level
+            self.rgb_led.set_values(self.red * level >> 8, self.green * level >> 8,
+                                    self.blue * level >> 8)
+            self.changed = False
+
+    async def run(self) -> None:
+        while True:
+            self.update()
+            await asyncio.sleep_ms(self.period_ms)
+
+
+class AsyncRuntime:
+    """Runs the game as uasyncio tasks.
+
+    The tick task keeps the fixed tick rate. When rendering falls behind,
+    up to max_catch_up_ticks are simulated back to back and the renders in
+    between are dropped. Beyond that the backlog is discarded (counted as
+    lost ticks) so a stalled frame cannot snowball. The render task draws
+    the latest state when a tick has happened and yields while the display
+    transfer is in progress, so the tick and LED tasks are not held up by
+    the bus.
+
+    Neither task allocates per frame: calling a coroutine function builds a
+    generator, so the transfer is not a coroutine of its own, and the render
+    task sleeps until the next tick is due with sleep_ms(), which reuses one
+    generator, where Event.wait() would build one per frame. With `allocations` enabled,
+    what tick, draw and show allocate is recorded.
+    """
+
+    def __init__(self, ticks_per_second: int, max_catch_up_ticks: int = 4):
+        self.step_us: int = 1000000 // ticks_per_second
+        self.max_catch_up_ticks: int = max_catch_up_ticks
+        self.stats = FrameStats()
+        self.ticks_since_render: int = 0
+        # when the tick task runs next, the render task sleeps until then
+        self.next_tick_at: int = time.ticks_us()
+        self.busy_us: int = 0
+
+    async def tick_task(self, tick, is_done, report_every: int = 0) -> None:
+        stats = self.stats
+        step_us = self.step_us
+        next_tick_at = time.ticks_us()
+        while not is_done():
+            self.next_tick_at = next_tick_at
+            wait_us = time.ticks_diff(next_tick_at, time.ticks_us())
+            if wait_us > 0:
+                # rounded up, so the task wakes once, at or just after the
+                # deadline, instead of polling for the last millisecond
+                await asyncio.sleep_ms((wait_us + 999) // 1000)
+                continue
+
+            ticks_run = 0
+            while wait_us <= 0 and ticks_run < self.max_catch_up_ticks:
+                stats.record_tick(-wait_us)
+                if allocations.enabled:
+                    allocated = gc.mem_alloc()
+                started = time.ticks_us()
+                tick()
+                elapsed_us = time.ticks_diff(time.ticks_us(), started)
+                if allocations.enabled:
+                    allocations.add("tick", gc.mem_alloc() - allocated)
+                self.busy_us += elapsed_us
+                if profiler.enabled:
+                    profiler.add("tick", elapsed_us)
+                ticks_run += 1
+                next_tick_at = time.ticks_add(next_tick_at, step_us)
+                wait_us = time.ticks_diff(next_tick_at, time.ticks_us())
+
+            if wait_us <= 0:
+                lost = -wait_us // step_us + 1
+                stats.lost_ticks += lost
+                next_tick_at = time.ticks_add(next_tick_at, lost * step_us)
+            self.ticks_since_render += ticks_run
+
+            if report_every and stats.ticks >= report_every:
+                self.report()
+
+    async def render_task(self, draw, display) -> None:
+        stats = self.stats
+        last_render_at = time.ticks_us()
+        paged = hasattr(display, "show_page")
+        while True:
+            while self.ticks_since_render == 0:
+                wait_us = time.ticks_diff(self.next_tick_at, time.ticks_us())
+                await asyncio.sleep_ms(max(0, (wait_us + 999) // 1000))
+            ticks = self.ticks_since_render
+            self.ticks_since_render = 0
+            stats.dropped_frames += ticks - 1
+            if allocations.enabled:
+                allocated = gc.mem_alloc()
+            started = time.ticks_us()
+            draw()
+            elapsed_us = time.ticks_diff(time.ticks_us(), started)
+            self.busy_us += elapsed_us
+            if profiler.enabled:
+                profiler.add("draw", elapsed_us)
+            if allocations.enabled:
+                allocations.add("draw", gc.mem_alloc() - allocated)
+
+            # display.show(), letting the other tasks run between page
+            # transfers. Only the time and memory spent sending count, not
+            # that of the other tasks in between.
+            show_allocated = 0
+            if allocations.enabled:
+                allocated = gc.mem_alloc()
+            started = time.ticks_us()
+            if not paged:
+                display.show()
+                show_us = time.ticks_diff(time.ticks_us(), started)
+            else:
+                pages_to_update = display.begin_show()
+                show_us = time.ticks_diff(time.ticks_us(), started)
+                for page in range(display.pages):
+                    if pages_to_update & (1 << page):
+                        started = time.ticks_us()
+                        display.show_page(page)
+                        show_us += time.ticks_diff(time.ticks_us(), started)
+                        if allocations.enabled:
+                            show_allocated += gc.mem_alloc() - allocated
+                        await asyncio.sleep_ms(0)
+                        if allocations.enabled:
+                            allocated = gc.mem_alloc()
+            if allocations.enabled:
+                allocations.add("show", show_allocated + gc.mem_alloc() - allocated)
+            self.busy_us += show_us
+            if profiler.enabled:
+                profiler.add("show", show_us)
+
+            now = time.ticks_us()
+            stats.record_render(abs(time.ticks_diff(now, last_render_at) - ticks * self.step_us))
+            last_render_at = now
+
+    def report(self) -> None:
+        stats = self.stats
+        # the tasks interleave, so idle time is what none of them used
+        elapsed_us = time.ticks_diff(time.ticks_us(), stats.started_at)
+        stats.idle_us = max(0, elapsed_us - self.busy_us)
+        print(stats.report())
+        if profiler.enabled:
+            profiler.dump()
+            profiler.reset()
+        if allocations.enabled:
+            allocations.dump()
+            allocations.reset()
+        stats.reset()
+        self.busy_us = 0
+
+    async def main(self, tick, draw, display, is_done, tasks, report_every: int) -> None:
+        running = [asyncio.create_task(task) for task in tasks]
+        running.append(asyncio.create_task(self.render_task(draw, display)))
+        await self.tick_task(tick, is_done, report_every)
+        for task in running:
+            task.cancel()
+
+    def run(self, tick, draw, display, is_done, tasks=(), report_every: int = 0) -> None:
+        """Ticks until is_done() returns True.
+
+        draw() renders the game state into display, tasks are further
+        coroutines, such as LedEffect.run(), to run alongside.
+        """
+        asyncio.run(self.main(tick, draw, display, is_done, tasks, report_every))
@@ -0,0 +1,47 @@
+import utime as time
+
+
+class FrameStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.ticks: int = 0
+        self.renders: int = 0
+        self.dropped_frames: int = 0
+        self.lost_ticks: int = 0
+        self.tick_jitter_sum_us: int = 0
+        self.tick_jitter_max_us: int = 0
+        self.render_jitter_sum_us: int = 0
+        self.render_jitter_max_us: int = 0
+        self.idle_us: int = 0
+        self.started_at: int = time.ticks_us()
+
+    def record_tick(self, late_us: int) -> None:
+        self.ticks += 1
+        self.tick_jitter_sum_us += late_us
+        if late_us > self.tick_jitter_max_us:
+            self.tick_jitter_max_us = late_us
+
+    def record_render(self, jitter_us: int) -> None:
+        self.renders += 1
+        self.render_jitter_sum_us += jitter_us
+        if jitter_us > self.render_jitter_max_us:
+            self.render_jitter_max_us = jitter_us
+
+    def report(self) -> str:
+        elapsed_us = max(1, time.ticks_diff(time.ticks_us(), self.started_at))
+        ticks = max(1, self.ticks)
+        renders = max(1, self.renders)
+        return "ticks={} renders={} dropped={} lost={} tick_jitter={}/{}us render_jitter={}/{}us idle={}%".format(
+            self.ticks,
+            self.renders,
+            self.dropped_frames,
+            self.lost_ticks,
+            self.tick_jitter_sum_us // ticks,
+            self.tick_jitter_max_us,
+            self.render_jitter_sum_us // renders,
+            self.render_jitter_max_us,
+            self.idle_us * 100 // elapsed_us,
+        )
+
@@ -72,8 +72,13 @@
 # display.show()
 
 from micropython import const
+import micropython
 import utime as time
 import framebuf
+try:
+    import _thread
+except ImportError:
+    _thread = None
 
 
 # a few register definitions
@@ -86,10 +91,90 @@ _LOW_COLUMN_ADDRESS  = const(0x00)
 _HIGH_COLUMN_ADDRESS = const(0x10)
 _SET_PAGE_ADDRESS    = const(0xB0)
 
+# dirty spans are widened to multiples of this many columns, so every span
+# can be sent from preallocated memoryviews of the display buffer
+_BLOCK = const(8)
+
+
+@micropython.native
+def _first_difference(a, b, start, end):
+    while start < end and a[start] == b[start]:
+        start += 1
+    return start
+
+
+@micropython.native
+def _last_difference(a, b, start, end):
+    # returns the index after the last differing byte
+    while end > start and a[end - 1] == b[end - 1]:
+        end -= 1
+    return end
+
+
+@micropython.native
+def _remap_page(db, rb, page, x0, x1, w, p):
+    # With rotate90 the render buffer holds column c of a page in byte
+    # c * pages + page, the display buffer at page * width + c.
+    src = x0 * p + page
+    for i in range(w * page + x0, w * page + x1):
+        db[i] = rb[src]
+        src += p
+
+
+@micropython.native
+def _copy(dst, src, start, end):
+    for i in range(start, end):
+        dst[i] = src[i]
+
+
+@micropython.native
+def _copy_rect_vlsb(dst, src, stride, x0, x1, y0, y1):
+    # copies rows y0 up to y1 of columns x0 up to x1, leaving the other bits
+    # of the pages they share untouched
+    y = y0
+    while y < y1:
+        start = (y >> 3) * stride
+        last = min(y1, (y | 7) + 1)
+        mask = ((1 << (last - y)) - 1) << (y & 7)
+        keep = 0xff ^ mask
+        for i in range(start + x0, start + x1):
+            dst[i] = (dst[i] & keep) | (src[i] & mask)
+        y = last
+
+
+@micropython.native
+def _copy_rect_hmsb(dst, src, stride, x0, x1, y0, y1):
+    # the same for MONO_HMSB, where a byte holds 8 columns of a row
+    first = x0 >> 3
+    last = (x1 - 1) >> 3
+    first_mask = (0xff << (x0 & 7)) & 0xff
+    last_mask = 0xff >> (7 - ((x1 - 1) & 7))
+    row_bytes = stride >> 3
+    for y in range(y0, y1):
+        start = y * row_bytes
+        for b in range(first, last + 1):
+            mask = 0xff
+            if b == first:
+                mask &= first_mask
+            if b == last:
+                mask &= last_mask
+            i = start + b
+            dst[i] = (dst[i] & (0xff ^ mask)) | (src[i] & mask)
+
+
+class _NoLock:
+    # stands in for a lock on ports without _thread
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
 
 class SH1106(framebuf.FrameBuffer):
 
-    def __init__(self, width, height, external_vcc, rotate=0):
+    def __init__(self, width, height, external_vcc, rotate=0, retained=False,
+                 double_buffered=False):
         self.width = width
         self.height = height
         self.external_vcc = external_vcc
@@ -99,6 +184,15 @@ class SH1106(framebuf.FrameBuffer):
         self.bufsize = self.pages * self.width
         self.renderbuf = bytearray(self.bufsize)
         self.pages_to_update = 0
+        # command sequences that are sent often are built in place
+        self.page_cmds = bytearray(3)
+        self.flip_cmds = bytearray(2)
+        self.contrast_cmds = bytearray((_SET_CONTRAST, 0))
+        # first and last changed column of every page, see register_updates()
+        self.dirty_x0 = bytearray(b'\xff' * self.pages)
+        self.dirty_x1 = bytearray(self.pages)
+        # spans at least this wide are sent as a full page
+        self.span_threshold = self.width * 3 // 4
 
         if self.rotate90:
             self.displaybuf = bytearray(self.bufsize)
@@ -112,17 +206,63 @@ class SH1106(framebuf.FrameBuffer):
             super().__init__(self.renderbuf, self.width, self.height,
                              framebuf.MONO_VLSB)
 
+        # In retained mode a copy of what was last sent to the panel is kept,
+        # and dirty pages whose bytes did not actually change are skipped.
+        # This makes redrawing the whole frame every time almost free on the bus.
+        self.double_buffered = double_buffered
+        self.retained = retained or double_buffered
+        if self.retained:
+            self.shadowbuf = bytearray(self.bufsize)
+
+        # Double buffered, drawing goes to renderbuf and swap() copies the
+        # finished frame to frontbuf, which is what show() sends. Each has
+        # its own dirty masks. show() takes the changes of a frame from
+        # frontbuf into shadowbuf under the lock and sends from shadowbuf,
+        # so swap() and show() can run on different cores without tearing.
+        if double_buffered:
+            self.frontbuf = bytearray(self.bufsize)
+            self.front_pages = 0
+            self.front_x0 = bytearray(b'\xff' * self.pages)
+            self.front_x1 = bytearray(self.pages)
+            self.lock = _thread.allocate_lock() if _thread else _NoLock()
+            # with rotate90 the frame is remapped from frontbuf into displaybuf
+            self.sourcebuf = self.displaybuf if self.rotate90 else self.frontbuf
+            self.sendbuf = self.shadowbuf
+        else:
+            self.front_x0 = self.dirty_x0
+            self.front_x1 = self.dirty_x1
+            self.sourcebuf = self.displaybuf
+            self.sendbuf = self.displaybuf
+        # spans prepared by begin_show() for show_page()
+        self.send_x0 = bytearray(self.pages)
+        self.send_x1 = bytearray(self.pages)
+
+        # Views of every page and of every _BLOCK columns of every page.
+        # Building them once keeps show() free of heap allocations.
+        display_mv = memoryview(self.sendbuf)
+        self.blocks = (self.width + _BLOCK - 1) // _BLOCK
+        self.page_views = []
+        self.block_views = []
+        for page in range(self.pages):
+            start = page * self.width
+            self.page_views.append(display_mv[start:start + self.width])
+            for block in range(self.blocks):
+                x0 = start + block * _BLOCK
+                self.block_views.append(display_mv[x0:min(x0 + _BLOCK, start + self.width)])
+
         # flip() was called rotate() once, provide backwards compatibility.
         self.rotate = self.flip
         self.init_display()
 
     def init_display(self):
         self.reset()
+        # rotate90 requires a call to flip() for setting up. The mirroring
+        # only affects data sent later, so the cleared frame is sent once,
+        # after it, and before the panel is switched on.
+        self.flip(self.flip_en, update=False)
         self.fill(0)
-        self.show()
+        self.show(True)
         self.poweron()
-        # rotate90 requires a call to flip() for setting up.
-        self.flip(self.flip_en)
 
     def poweroff(self):
         self.write_cmd(_SET_DISP | 0x00)
@@ -137,8 +277,9 @@ class SH1106(framebuf.FrameBuffer):
             flag = not self.flip_en
         mir_v = flag ^ self.rotate90
         mir_h = flag
-        self.write_cmd(_SET_SEG_REMAP | (0x01 if mir_v else 0x00))
-        self.write_cmd(_SET_SCAN_DIR | (0x08 if mir_h else 0x00))
+        self.flip_cmds[0] = _SET_SEG_REMAP | (0x01 if mir_v else 0x00)
+        self.flip_cmds[1] = _SET_SCAN_DIR | (0x08 if mir_h else 0x00)
+        self.write_cmds(self.flip_cmds)
         self.flip_en = flag
         if update:
             self.show(True) # full update
@@ -147,88 +288,219 @@ class SH1106(framebuf.FrameBuffer):
         self.write_cmd(_SET_DISP | (not value))
 
     def contrast(self, contrast):
-        self.write_cmd(_SET_CONTRAST)
-        self.write_cmd(contrast)
+        self.contrast_cmds[1] = contrast
+        self.write_cmds(self.contrast_cmds)
 
     def invert(self, invert):
         self.write_cmd(_SET_NORM_INV | (invert & 1))
 
     def show(self, full_update = False):
-        # self.* lookups in loops take significant time (~4fps).
-        (w, p, db, rb) = (self.width, self.pages,
-                          self.displaybuf, self.renderbuf)
-        if self.rotate90:
-            for i in range(self.bufsize):
-                db[w * (i % p) + (i // p)] = rb[i]
-        if full_update:
-            pages_to_update = (1 << self.pages) - 1
-        else:
-            pages_to_update = self.pages_to_update
+        pages_to_update = self.begin_show(full_update)
         #print("Updating pages: {:08b}".format(pages_to_update))
         for page in range(self.pages):
             if (pages_to_update & (1 << page)):
-                self.write_cmd(_SET_PAGE_ADDRESS | page)
-                self.write_cmd(_LOW_COLUMN_ADDRESS | 2)
-                self.write_cmd(_HIGH_COLUMN_ADDRESS | 0)
-                self.write_data(db[(w*page):(w*page+w)])
+                self.show_page(page, full_update)
+
+    def swap(self):
+        # hands the frame drawn so far to show(), double buffered only
+        self.lock.acquire()
+        self.frontbuf[:] = self.renderbuf
+        # unpacking more than three values at once builds a tuple, which
+        # allocates, so they are fetched in pairs
+        (dirty_x0, dirty_x1) = (self.dirty_x0, self.dirty_x1)
+        (front_x0, front_x1) = (self.front_x0, self.front_x1)
+        pages_to_update = self.pages_to_update
+        for page in range(self.pages):
+            if pages_to_update & (1 << page):
+                if dirty_x0[page] < front_x0[page]:
+                    front_x0[page] = dirty_x0[page]
+                if dirty_x1[page] > front_x1[page]:
+                    front_x1[page] = dirty_x1[page]
+                dirty_x0[page] = 0xff
+                dirty_x1[page] = 0
+        self.front_pages |= pages_to_update
         self.pages_to_update = 0
+        self.lock.release()
+
+    def begin_show(self, full_update = False):
+        # returns the pages to pass to show_page(), which lets callers such
+        # as the async runtime do other work between the page transfers
+        if not self.double_buffered:
+            if full_update:
+                pages_to_update = (1 << self.pages) - 1
+            else:
+                pages_to_update = self.pages_to_update
+            self.pages_to_update = 0
+            return pages_to_update
+        # take all changes of the front frame at once, so a swap() during
+        # the transfer cannot mix two frames
+        self.lock.acquire()
+        if full_update:
+            pages_to_update = (1 << self.pages) - 1
+        else:
+            pages_to_update = self.front_pages
+        self.front_pages = 0
+        for page in range(self.pages):
+            if pages_to_update & (1 << page):
+                if not self.prepare_page(page, full_update):
+                    pages_to_update &= ~(1 << page)
+        self.lock.release()
+        return pages_to_update
+
+    def show_page(self, page, full_update = False):
+        if self.double_buffered or self.prepare_page(page, full_update):
+            self.write_page(page, self.send_x0[page], self.send_x1[page])
+
+    def prepare_page(self, page, full_update = False):
+        # works out the span of a dirty page to send, returns False if
+        # there is nothing to send
+        # self.* lookups take significant time, fetch them once, at most
+        # three at a time, more would allocate a tuple
+        (w, p) = (self.width, self.pages)
+        (db, sb) = (self.displaybuf, self.sourcebuf)
+        (dirty_x0, dirty_x1, retained) = (self.front_x0, self.front_x1,
+                                          self.retained)
+        x0 = dirty_x0[page]
+        x1 = dirty_x1[page] + 1
+        dirty_x0[page] = 0xff
+        dirty_x1[page] = 0
+        if full_update or x0 >= x1:
+            x0 = 0
+            x1 = w
+        if self.rotate90:
+            # only the dirty span can differ from the last remap
+            _remap_page(db, self.frontbuf if self.double_buffered else self.renderbuf,
+                        page, x0, x1, w, p)
+        start = w * page
+        if retained and not full_update:
+            x0 = _first_difference(sb, self.shadowbuf, start + x0, start + x1) - start
+            if x0 == x1:
+                return False
+            x1 = _last_difference(sb, self.shadowbuf, start + x0, start + x1) - start
+        x0 -= x0 % _BLOCK
+        x1 = min(w, x1 + (-x1) % _BLOCK)
+        if x1 - x0 >= self.span_threshold:
+            x0 = 0
+            x1 = w
+        if retained:
+            _copy(self.shadowbuf, sb, start + x0, start + x1)
+        self.send_x0[page] = x0
+        self.send_x1[page] = x1
+        return True
 
     def pixel(self, x, y, color=None):
         if color is None:
             return super().pixel(x, y)
         else:
             super().pixel(x, y , color)
-            page = y // 8
-            self.pages_to_update |= 1 << page
+            self.register_updates(y, y, x, x)
 
     def text(self, text, x, y, color=1):
         super().text(text, x, y, color)
-        self.register_updates(y, y+7)
+        self.register_updates(y, y+7, x, x+8*len(text)-1)
 
     def line(self, x0, y0, x1, y1, color):
         super().line(x0, y0, x1, y1, color)
-        self.register_updates(y0, y1)
+        self.register_updates(y0, y1, x0, x1)
 
     def hline(self, x, y, w, color):
         super().hline(x, y, w, color)
-        self.register_updates(y)
+        self.register_updates(y, y, x, x+w-1)
 
     def vline(self, x, y, h, color):
         super().vline(x, y, h, color)
-        self.register_updates(y, y+h-1)
+        self.register_updates(y, y+h-1, x, x)
 
     def fill(self, color):
         super().fill(color)
-        self.pages_to_update = (1 << self.pages) - 1
+        self.register_updates(0, self.bufsize)
+
+    def save_frame(self, buffer):
+        # copies the whole frame to buffer, for load_frame() to restore
+        buffer[:] = self.renderbuf
+
+    def load_frame(self, buffer):
+        # replaces the whole frame with one saved by save_frame(), a single
+        # copy instead of drawing it again
+        self.renderbuf[:] = buffer
+        self.register_updates(0, self.bufsize)
+
+    def copy_rect(self, dst, src, x, y, w, h):
+        # copies a rectangle between two buffers laid out like the render
+        # buffer, returns False if it is off screen
+        if self.rotate90:
+            (width, height) = (self.height, self.width)
+        else:
+            (width, height) = (self.width, self.height)
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(width, x + w)
+        y1 = min(height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return False
+        if self.rotate90:
+            _copy_rect_hmsb(dst, src, width, x0, x1, y0, y1)
+        else:
+            _copy_rect_vlsb(dst, src, width, x0, x1, y0, y1)
+        return True
+
+    def restore_rect(self, buffer, x, y, w, h):
+        # puts back a rectangle of a frame saved by save_frame(), the way
+        # sprites are erased
+        if self.copy_rect(self.renderbuf, buffer, x, y, w, h):
+            self.register_updates(y, y+h-1, x, x+w-1)
 
     def blit(self, fbuf, x, y, key=-1, palette=None):
         super().blit(fbuf, x, y, key, palette)
-        self.register_updates(y, y+self.height)
+        # a plain FrameBuffer does not expose its size, assume it reaches
+        # the edge of the screen unless the source tells otherwise
+        w = getattr(fbuf, 'width', self.bufsize)
+        h = getattr(fbuf, 'height', self.bufsize)
+        self.register_updates(y, y+h-1, x, x+w-1)
 
     def scroll(self, x, y):
         # my understanding is that scroll() does a full screen change
         super().scroll(x, y)
-        self.pages_to_update =  (1 << self.pages) - 1
+        self.register_updates(0, self.bufsize)
 
     def fill_rect(self, x, y, w, h, color):
         super().fill_rect(x, y, w, h, color)
-        self.register_updates(y, y+h-1)
+        self.register_updates(y, y+h-1, x, x+w-1)
 
     def rect(self, x, y, w, h, color):
         super().rect(x, y, w, h, color)
-        self.register_updates(y, y+h-1)
-
-    def register_updates(self, y0, y1=None):
-        # this function takes the top and optional bottom address of the changes made
-        # and updates the pages_to_change list with any changed pages
-        # that are not yet on the list
+        self.register_updates(y, y+h-1, x, x+w-1)
+
+    def register_updates(self, y0, y1=None, x0=0, x1=None):
+        # this function takes the top and optional bottom address of the changes made,
+        # optionally narrowed down to the columns x0..x1, and widens the dirty
+        # column span of every page it touches. Coordinates are the ones used
+        # for drawing, so with rotate90 render x maps to pages and y to columns.
+        if y1 is None:
+            y1 = y0
+        if x1 is None:
+            x1 = self.bufsize
+        # rearrange the coordinates if they were given from bottom to top
+        if y0 > y1:
+            y0, y1 = y1, y0
+        if x0 > x1:
+            x0, x1 = x1, x0
+        if self.rotate90:
+            x0, y0 = y0, x0
+            x1, y1 = y1, x1
         start_page = max(0, y0 // 8)
-        end_page = max(0, y1 // 8) if y1 is not None else start_page
-        # rearrange start_page and end_page if coordinates were given from bottom to top
-        if start_page > end_page:
-            start_page, end_page = end_page, start_page
+        end_page = min(self.pages - 1, y1 // 8)
+        x0 = max(0, x0)
+        x1 = min(self.width - 1, x1)
+        if x0 > x1:
+            return
+        (dirty_x0, dirty_x1) = (self.dirty_x0, self.dirty_x1)
         for page in range(start_page, end_page+1):
             self.pages_to_update |= 1 << page
+            if x0 < dirty_x0[page]:
+                dirty_x0[page] = x0
+            if x1 > dirty_x1[page]:
+                dirty_x1[page] = x1
 
     def reset(self, res):
         if res is not None:
@@ -242,23 +514,60 @@ class SH1106(framebuf.FrameBuffer):
 
 class SH1106_I2C(SH1106):
     def __init__(self, width, height, i2c, res=None, addr=0x3c,
-                 rotate=0, external_vcc=False, delay=0):
+                 rotate=0, external_vcc=False, delay=0, retained=False,
+                 double_buffered=False):
         self.i2c = i2c
         self.addr = addr
         self.res = res
         self.temp = bytearray(2)
+        self.write_list = [b'\x40', None]  # Co=0, D/C#=1
+        self.cmd_list = [b'\x00', None]  # Co=0, D/C#=0
+        # Page address, column address and the start of the data stream in a
+        # single transaction: each command is preceded by a Co=1 control byte,
+        # the final Co=0 control byte turns the rest of the transfer into data.
+        # Data can not be followed by further commands, so one transaction
+        # per page is as far as pages can be coalesced.
+        self.page_header = bytearray(b'\x80\x00\x80\x00\x80\x00\x40')
+        # span_vectors[n] holds the header followed by n block views
+        self.span_vectors = [[self.page_header] + [None] * n
+                             for n in range((width + _BLOCK - 1) // _BLOCK + 1)]
         self.delay = delay
         if res is not None:
             res.init(res.OUT, value=1)
-        super().__init__(width, height, external_vcc, rotate)
+        super().__init__(width, height, external_vcc, rotate, retained,
+                         double_buffered)
 
     def write_cmd(self, cmd):
         self.temp[0] = 0x80  # Co=1, D/C#=0
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
 
+    def write_cmds(self, cmds):
+        # a single Co=0 control byte turns the whole transfer into commands
+        self.cmd_list[1] = cmds
+        self.i2c.writevto(self.addr, self.cmd_list)
+
     def write_data(self, buf):
-        self.i2c.writeto(self.addr, b'\x40'+buf)
+        self.write_list[1] = buf
+        self.i2c.writevto(self.addr, self.write_list)
+
+    def write_page(self, page, x0, x1):
+        header = self.page_header
+        column = x0 + 2
+        header[1] = _SET_PAGE_ADDRESS | page
+        header[3] = _LOW_COLUMN_ADDRESS | (column & 0x0f)
+        header[5] = _HIGH_COLUMN_ADDRESS | (column >> 4)
+        if x1 - x0 == self.width:
+            vector = self.span_vectors[1]
+            vector[1] = self.page_views[page]
+        else:
+            first = page * self.blocks + x0 // _BLOCK
+            count = (x1 - x0 + _BLOCK - 1) // _BLOCK
+            vector = self.span_vectors[count]
+            block_views = self.block_views
+            for i in range(count):
+                vector[i + 1] = block_views[first + i]
+        self.i2c.writevto(self.addr, vector)
 
     def reset(self):
         super().reset(self.res)
@@ -266,7 +575,8 @@ class SH1106_I2C(SH1106):
 
 class SH1106_SPI(SH1106):
     def __init__(self, width, height, spi, dc, res=None, cs=None,
-                 rotate=0, external_vcc=False, delay=0):
+                 rotate=0, external_vcc=False, delay=0, retained=False,
+                 double_buffered=False):
         dc.init(dc.OUT, value=0)
         if res is not None:
             res.init(res.OUT, value=0)
@@ -277,29 +587,71 @@ class SH1106_SPI(SH1106):
         self.res = res
         self.cs = cs
         self.delay = delay
-        super().__init__(width, height, external_vcc, rotate)
+        self.cmd = bytearray(1)
+        # set while show() holds CS for the whole frame
+        self.framed = False
+        super().__init__(width, height, external_vcc, rotate, retained,
+                         double_buffered)
+
+    def show(self, full_update=False):
+        pending = self.front_pages if self.double_buffered else self.pages_to_update
+        if self.cs is None or not (full_update or pending):
+            super().show(full_update)
+            return
+        # DC is sampled per byte, so commands and data of every page can
+        # share a single CS assertion
+        self.cs(1)
+        self.cs(0)
+        self.framed = True
+        try:
+            super().show(full_update)
+        finally:
+            self.framed = False
+            self.cs(1)
 
-    def write_cmd(self, cmd):
-        if self.cs is not None:
+    def write(self, dc, buf):
+        if self.cs is None or self.framed:
+            self.dc(dc)
+            self.spi.write(buf)
+        else:
             self.cs(1)
-            self.dc(0)
+            self.dc(dc)
             self.cs(0)
-            self.spi.write(bytearray([cmd]))
+            self.spi.write(buf)
             self.cs(1)
-        else:
-            self.dc(0)
-            self.spi.write(bytearray([cmd]))
+
+    def write_cmd(self, cmd):
+        self.cmd[0] = cmd
+        self.write(0, self.cmd)
+
+    def write_cmds(self, cmds):
+        self.write(0, cmds)
 
     def write_data(self, buf):
-        if self.cs is not None:
+        self.write(1, buf)
+
+    def write_page(self, page, x0, x1):
+        cmds = self.page_cmds
+        column = x0 + 2
+        cmds[0] = _SET_PAGE_ADDRESS | page
+        cmds[1] = _LOW_COLUMN_ADDRESS | (column & 0x0f)
+        cmds[2] = _HIGH_COLUMN_ADDRESS | (column >> 4)
+        self.write(0, cmds)
+        if x1 - x0 == self.width:
+            self.write(1, self.page_views[page])
+            return
+        # show() holds CS for the whole frame, show_page() on its own does not
+        framed = self.cs is None or self.framed
+        if not framed:
             self.cs(1)
-            self.dc(1)
             self.cs(0)
-            self.spi.write(buf)
+        self.dc(1)
+        first = page * self.blocks + x0 // _BLOCK
+        block_views = self.block_views
+        for i in range(first, first + (x1 - x0 + _BLOCK - 1) // _BLOCK):
+            self.spi.write(block_views[i])
+        if not framed:
             self.cs(1)
-        else:
-            self.dc(1)
-            self.spi.write(buf)
 
     def reset(self):
         super().reset(self.res)
@@ -0,0 +1,168 @@
+import array
+
+from glyphs import TextCache
+
+
+class Sprite:
+    """Something that moves or changes over a static background.
+
+    Without a bitmap the sprite is a filled rectangle. Sprites only set
+    pixels, like framebuf.text() and a blit() with key 0, so the order they
+    are drawn in does not matter.
+    """
+
+    def __init__(self, width: int, height: int, bitmap=None, x: int = 0, y: int = 0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.bitmap = bitmap
+        self.visible = True
+        self.changed = True
+        # the rectangle it covers on the display, if drawn
+        self.drawn = False
+        self.drawn_x = 0
+        self.drawn_y = 0
+        self.drawn_width = 0
+        self.drawn_height = 0
+
+    def move_to(self, x: int, y: int) -> None:
+        if x != self.x or y != self.y:
+            self.x = x
+            self.y = y
+            self.changed = True
+
+    def show(self) -> None:
+        if not self.visible:
+            self.visible = True
+            self.changed = True
+
+    def hide(self) -> None:
+        if self.visible:
+            self.visible = False
+            self.changed = True
+
+    def draw(self, display) -> None:
+        if self.bitmap is None:
+            display.fill_rect(self.x, self.y, self.width, self.height, 1)
+        else:
+            display.blit(self.bitmap, self.x, self.y, 0)
+
+    def overlaps(self, x: int, y: int, w: int, h: int) -> bool:
+        return (self.x < x + w and x < self.x + self.width
+                and self.y < y + h and y < self.y + self.height)
+
+
+class TextSprite(Sprite):
+    """A string drawn from a TextCache."""
+
+    def __init__(self, text_cache: TextCache, text: str, x: int = 0, y: int = 0):
+        self.text_cache = text_cache
+        self.text = None
+        super().__init__(0, 8, None, x, y)
+        self.set_text(text)
+
+    def set_text(self, text: str) -> None:
+        if text != self.text:
+            self.text = text
+            self.width = self.text_cache.glyph(text).width
+            self.changed = True
+
+    def draw(self, display) -> None:
+        # through the cache, so the glyph counts as recently used
+        self.text_cache.text(display, self.text, self.x, self.y)
+
+
+class NumberSprite(Sprite):
+    """A number drawn from the digit atlas of a TextCache."""
+
+    def __init__(self, text_cache: TextCache, value: int = 0, x: int = 0, y: int = 0):
+        self.text_cache = text_cache
+        self.value = None
+        super().__init__(0, 8, None, x, y)
+        self.set_value(value)
+
+    def set_value(self, value: int) -> None:
+        if value != self.value:
+            self.value = value
+            self.width = self.text_cache.number_width(value)
+            self.changed = True
+
+    def draw(self, display) -> None:
+        self.text_cache.number(display, self.value, self.x, self.y)
+
+
+class SpriteLayer:
+    """Keeps sprites on a display over a background saved with save_frame().
+
+    draw() erases the rectangle every changed sprite covered, restoring the
+    background there, and draws the sprites that changed or were partly
+    erased. The display only marks those rectangles dirty. When the erased
+    area gets larger than `reload_ratio` of the screen, the whole background
+    is loaded instead and every sprite redrawn.
+    """
+
+    def __init__(self, display, background: bytearray, reload_ratio: float = 0.5):
+        self.display = display
+        self.background = background
+        self.sprites = []
+        self.reload_area = int(len(background) * 8 * reload_ratio)
+        # x, y, width and height of the rectangles erased by the last draw()
+        self.erased = array.array("h")
+        self.erased_count: int = 0
+
+    def add(self, sprite: Sprite) -> Sprite:
+        self.sprites.append(sprite)
+        self.erased = array.array("h", [0] * (4 * len(self.sprites)))
+        return sprite
+
+    def reset(self) -> None:
+        """Forgets what was drawn, for a background drawn anew."""
+        for sprite in self.sprites:
+            sprite.drawn = False
+            sprite.changed = True
+
+    def draw(self) -> None:
+        display = self.display
+        sprites = self.sprites
+        area = 0
+        for sprite in sprites:
+            if sprite.changed and sprite.drawn:
+                area += sprite.drawn_width * sprite.drawn_height
+        reload = area > self.reload_area
+        erased = self.erased
+        count = 0
+        if reload:
+            display.load_frame(self.background)
+        else:
+            for sprite in sprites:
+                if sprite.changed and sprite.drawn:
+                    display.restore_rect(self.background, sprite.drawn_x, sprite.drawn_y,
+                                         sprite.drawn_width, sprite.drawn_height)
+                    i = 4 * count
+                    erased[i] = sprite.drawn_x
+                    erased[i + 1] = sprite.drawn_y
+                    erased[i + 2] = sprite.drawn_width
+                    erased[i + 3] = sprite.drawn_height
+                    count += 1
+        self.erased_count = count
+        for sprite in sprites:
+            if sprite.visible and (reload or sprite.changed or self.was_erased(sprite)):
+                sprite.draw(display)
+        for sprite in sprites:
+            if sprite.changed:
+                sprite.changed = False
+                sprite.drawn = sprite.visible
+                sprite.drawn_x = sprite.x
+                sprite.drawn_y = sprite.y
+                sprite.drawn_width = sprite.width
+                sprite.drawn_height = sprite.height
+
+    def was_erased(self, sprite: Sprite) -> bool:
+        # only the rectangles of changed sprites are erased, usually a few,
+        # and a sprite that erased its own is redrawn anyway
+        erased = self.erased
+        for i in range(0, 4 * self.erased_count, 4):
+            if sprite.overlaps(erased[i], erased[i + 1], erased[i + 2], erased[i + 3]):
+                return True
+        return False
@@ -4,8 +4,9 @@
 # https://github.com/micropython/micropython/blob/master/drivers/display/ssd1306.py
 #
 from micropython import const
+import micropython
 import framebuf
-import time
+import utime as time
 
 # Register definitions
 SET_CONTRAST = const(0x81)
@@ -26,20 +27,84 @@ SET_PRECHARGE = const(0xD9)
 SET_VCOM_DESEL = const(0xDB)
 SET_CHARGE_PUMP = const(0x8D)
 
+# dirty spans are widened to multiples of this many columns, so every span
+# can be sent from preallocated memoryviews of the buffer
+_BLOCK = const(8)
+
+
+@micropython.native
+def _first_difference(a, b, start, end):
+    while start < end and a[start] == b[start]:
+        start += 1
+    return start
+
+
+@micropython.native
+def _last_difference(a, b, start, end):
+    # returns the index after the last differing byte
+    while end > start and a[end - 1] == b[end - 1]:
+        end -= 1
+    return end
+
+
+@micropython.native
+def _copy(dst, src, start, end):
+    for i in range(start, end):
+        dst[i] = src[i]
+
+
+@micropython.native
+def _copy_rect_vlsb(dst, src, stride, x0, x1, y0, y1):
+    # copies rows y0 up to y1 of columns x0 up to x1, leaving the other bits
+    # of the pages they share untouched
+    y = y0
+    while y < y1:
+        start = (y >> 3) * stride
+        last = min(y1, (y | 7) + 1)
+        mask = ((1 << (last - y)) - 1) << (y & 7)
+        keep = 0xff ^ mask
+        for i in range(start + x0, start + x1):
+            dst[i] = (dst[i] & keep) | (src[i] & mask)
+        y = last
+
+
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
 class SSD1306(framebuf.FrameBuffer):
-    def __init__(self, width, height, external_vcc):
+    def __init__(self, width, height, external_vcc, retained=False):
         self.width = width
         self.height = height
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
+        # command sequences that are sent often are built in place
+        self.window_cmds = bytearray(6)
+        self.contrast_cmds = bytearray((SET_CONTRAST, 0))
+        # Changed pages, and the first and last changed column of each page.
+        # show() only sends the window that bounds all of them.
+        self.pages_to_update = 0
+        self.dirty_x0 = bytearray(b"\xff" * self.pages)
+        self.dirty_x1 = bytearray(self.pages)
+        # With retained=True a copy of what the panel shows is kept, and
+        # bytes that were redrawn with the same value are not resent.
+        self.retained = retained
+        if retained:
+            self.shadow = bytearray(len(self.buffer))
+        # views of every _BLOCK columns of every page, so show() does not
+        # have to allocate
+        buffer_mv = memoryview(self.buffer)
+        self.blocks = (self.width + _BLOCK - 1) // _BLOCK
+        self.block_views = []
+        for page in range(self.pages):
+            start = page * self.width
+            for block in range(self.blocks):
+                x0 = start + block * _BLOCK
+                self.block_views.append(buffer_mv[x0:min(x0 + _BLOCK, start + self.width)])
         self.init_display()
 
     def init_display(self):
-        for cmd in (
+        self.write_cmds(bytes((
             SET_DISP | 0x00,  # off
             # Address setting
             SET_MEM_ADDR,
@@ -69,11 +134,10 @@ class SSD1306(framebuf.FrameBuffer):
             # Charge pump
             SET_CHARGE_PUMP,
             0x10 if self.external_vcc else 0x14,
-            SET_DISP | 0x01,
-        ):  # On
-            self.write_cmd(cmd)
+            SET_DISP | 0x01,  # On
+        )))
         self.fill(0)
-        self.show()
+        self.show(True)
 
     def poweroff(self):
         self.write_cmd(SET_DISP | 0x00)
@@ -82,48 +146,217 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_DISP | 0x01)
 
     def contrast(self, contrast):
-        self.write_cmd(SET_CONTRAST)
-        self.write_cmd(contrast)
+        self.contrast_cmds[1] = contrast
+        self.write_cmds(self.contrast_cmds)
 
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
+    def show(self, full_update=False):
+        if full_update:
+            self.write_window(0, self.pages - 1, 0, self.width)
+            self.write_data(self.buffer)
+            if self.retained:
+                _copy(self.shadow, self.buffer, 0, len(self.buffer))
+            self.clear_updates()
+            return
+        w = self.width
+        buf = self.buffer
+        dirty_x0 = self.dirty_x0
+        dirty_x1 = self.dirty_x1
+        page0 = self.pages
+        page1 = -1
+        x0 = w
+        x1 = 0
+        for page in range(self.pages):
+            if not self.pages_to_update & (1 << page):
+                continue
+            start = page * w
+            p0 = dirty_x0[page]
+            p1 = dirty_x1[page] + 1
+            if p0 >= p1:
+                p0 = 0
+                p1 = w
+            if self.retained:
+                p0 = _first_difference(buf, self.shadow, start + p0, start + p1) - start
+                if p0 == p1:
+                    continue
+                p1 = _last_difference(buf, self.shadow, start + p0, start + p1) - start
+            if page < page0:
+                page0 = page
+            page1 = page
+            if p0 < x0:
+                x0 = p0
+            if p1 > x1:
+                x1 = p1
+        self.clear_updates()
+        if page1 < 0:
+            return
+        x0 -= x0 % _BLOCK
+        x1 = min(w, x1 + (-x1) % _BLOCK)
+        self.write_window(page0, page1, x0, x1)
+        if self.retained:
+            for page in range(page0, page1 + 1):
+                _copy(self.shadow, buf, page * w + x0, page * w + x1)
+        if x1 - x0 == w and page1 - page0 == self.pages - 1:
+            self.write_data(buf)
+        else:
+            first = x0 // _BLOCK
+            count = (x1 - x0 + _BLOCK - 1) // _BLOCK
+            for page in range(page0, page1 + 1):
+                self.write_blocks(page * self.blocks + first, count)
+
+    def write_window(self, page0, page1, x0, x1):
+        # sets the RAM window the following data fills, x1 is exclusive
         if self.width == 64:
             # Displays with width of 64 pixels are shifted by 32
             x0 += 32
             x1 += 32
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        cmds = self.window_cmds
+        cmds[0] = SET_COL_ADDR
+        cmds[1] = x0
+        cmds[2] = x1 - 1
+        cmds[3] = SET_PAGE_ADDR
+        cmds[4] = page0
+        cmds[5] = page1
+        self.write_cmds(cmds)
+
+    def clear_updates(self):
+        self.pages_to_update = 0
+        for page in range(self.pages):
+            self.dirty_x0[page] = 0xFF
+            self.dirty_x1[page] = 0
+
+    def register_updates(self, y0, y1=None, x0=0, x1=None):
+        # marks the rows y0..y1 between columns x0..x1 as changed
+        if y1 is None:
+            y1 = y0
+        if x1 is None:
+            x1 = self.width - 1
+        if y0 > y1:
+            y0, y1 = y1, y0
+        if x0 > x1:
+            x0, x1 = x1, x0
+        start_page = max(0, y0 // 8)
+        end_page = min(self.pages - 1, y1 // 8)
+        x0 = max(0, x0)
+        x1 = min(self.width - 1, x1)
+        if x0 > x1:
+            return
+        dirty_x0 = self.dirty_x0
+        dirty_x1 = self.dirty_x1
+        for page in range(start_page, end_page + 1):
+            self.pages_to_update |= 1 << page
+            if x0 < dirty_x0[page]:
+                dirty_x0[page] = x0
+            if x1 > dirty_x1[page]:
+                dirty_x1[page] = x1
+
+    def pixel(self, x, y, color=None):
+        if color is None:
+            return super().pixel(x, y)
+        super().pixel(x, y, color)
+        self.register_updates(y, y, x, x)
+
+    def text(self, text, x, y, color=1):
+        super().text(text, x, y, color)
+        self.register_updates(y, y + 7, x, x + 8 * len(text) - 1)
+
+    def line(self, x0, y0, x1, y1, color):
+        super().line(x0, y0, x1, y1, color)
+        self.register_updates(y0, y1, x0, x1)
+
+    def hline(self, x, y, w, color):
+        super().hline(x, y, w, color)
+        self.register_updates(y, y, x, x + w - 1)
+
+    def vline(self, x, y, h, color):
+        super().vline(x, y, h, color)
+        self.register_updates(y, y + h - 1, x, x)
+
+    def fill(self, color):
+        super().fill(color)
+        self.register_updates(0, self.height - 1)
+
+    def save_frame(self, buffer):
+        # copies the whole frame to buffer, for load_frame() to restore
+        buffer[:] = self.buffer
+
+    def load_frame(self, buffer):
+        # replaces the whole frame with one saved by save_frame()
+        self.buffer[:] = buffer
+        self.register_updates(0, self.height - 1)
+
+    def restore_rect(self, buffer, x, y, w, h):
+        # puts back a rectangle of a frame saved by save_frame()
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if x0 < x1 and y0 < y1:
+            _copy_rect_vlsb(self.buffer, buffer, self.width, x0, x1, y0, y1)
+            self.register_updates(y0, y1 - 1, x0, x1 - 1)
+
+    def fill_rect(self, x, y, w, h, color):
+        super().fill_rect(x, y, w, h, color)
+        self.register_updates(y, y + h - 1, x, x + w - 1)
+
+    def rect(self, x, y, w, h, color):
+        super().rect(x, y, w, h, color)
+        self.register_updates(y, y + h - 1, x, x + w - 1)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        super().blit(fbuf, x, y, key, palette)
+        # a plain FrameBuffer does not expose its size
+        w = getattr(fbuf, "width", self.width)
+        h = getattr(fbuf, "height", self.height)
+        self.register_updates(y, y + h - 1, x, x + w - 1)
+
+    def scroll(self, x, y):
+        super().scroll(x, y)
+        self.register_updates(0, self.height - 1)
 
 
 class SSD1306_I2C(SSD1306):
-    def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False):
+    def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False,
+                 retained=False):
         self.i2c = i2c
         self.addr = addr
         self.temp = bytearray(2)
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
-        super().__init__(width, height, external_vcc)
+        self.cmd_list = [b"\x00", None]  # Co=0, D/C#=0
+        # span_vectors[n] holds the data control byte followed by n block views
+        self.span_vectors = [[b"\x40"] + [None] * n
+                             for n in range((width + _BLOCK - 1) // _BLOCK + 1)]
+        super().__init__(width, height, external_vcc, retained)
 
     def write_cmd(self, cmd):
         self.temp[0] = 0x80  # Co=1, D/C#=0
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
 
+    def write_cmds(self, cmds):
+        # a single Co=0 control byte turns the whole transfer into commands
+        self.cmd_list[1] = cmds
+        self.i2c.writevto(self.addr, self.cmd_list)
+
     def write_data(self, buf):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
 
+    def write_blocks(self, first, count):
+        # the RAM address carries over between transactions, so every page
+        # of the window can be sent on its own
+        vector = self.span_vectors[count]
+        block_views = self.block_views
+        for i in range(count):
+            vector[i + 1] = block_views[first + i]
+        self.i2c.writevto(self.addr, vector)
+
 # Only required for SPI version (not covered in this project)
 class SSD1306_SPI(SSD1306):
-    def __init__(self, width, height, spi, dc, res, cs, external_vcc=False):
+    def __init__(self, width, height, spi, dc, res, cs, external_vcc=False,
+                 retained=False):
         self.rate = 10 * 1024 * 1024
         dc.init(dc.OUT, value=0)
         res.init(res.OUT, value=0)
@@ -132,26 +365,61 @@ class SSD1306_SPI(SSD1306):
         self.dc = dc
         self.res = res
         self.cs = cs
+        self.cmd = bytearray(1)
+        # set while show() holds CS for the whole frame
+        self.framed = False
 
         self.res(1)
         time.sleep_ms(1)
         self.res(0)
         time.sleep_ms(10)
         self.res(1)
-        super().__init__(width, height, external_vcc)
-
-    def write_cmd(self, cmd):
+        # configured once, the display is expected to have the bus to itself
         self.spi.init(baudrate=self.rate, polarity=0, phase=0)
+        super().__init__(width, height, external_vcc, retained)
+
+    def show(self, full_update=False):
+        if not (full_update or self.pages_to_update):
+            return
+        # DC is sampled per byte, so the window commands and the data of
+        # every page can share a single CS assertion
         self.cs(1)
-        self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([cmd]))
-        self.cs(1)
+        self.framed = True
+        try:
+            super().show(full_update)
+        finally:
+            self.framed = False
+            self.cs(1)
+
+    def write(self, dc, buf):
+        if self.framed:
+            self.dc(dc)
+            self.spi.write(buf)
+        else:
+            self.cs(1)
+            self.dc(dc)
+            self.cs(0)
+            self.spi.write(buf)
+            self.cs(1)
+
+    def write_cmd(self, cmd):
+        self.cmd[0] = cmd
+        self.write(0, self.cmd)
+
+    def write_cmds(self, cmds):
+        self.write(0, cmds)
 
     def write_data(self, buf):
-        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
-        self.cs(1)
+        self.write(1, buf)
+
+    def write_blocks(self, first, count):
+        if not self.framed:
+            self.cs(1)
+            self.cs(0)
         self.dc(1)
-        self.cs(0)
-        self.spi.write(buf)
-        self.cs(1)
+        block_views = self.block_views
+        for i in range(first, first + count):
+            self.spi.write(block_views[i])
+        if not self.framed:
+            self.cs(1)
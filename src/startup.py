@@ -0,0 +1,44 @@
+import gc
+import utime as time
+
+
+class StartupProfile:
+    """Times the stages of start-up and the heap in use after each.
+
+    Call stage() at the end of every stage. The time of a stage runs from the
+    end of the previous one, the first from when this module was imported,
+    and the collection stage() does for the heap figure is left out.
+    report() prints the stages recorded since the last report.
+    """
+
+    def __init__(self):
+        self.started_at: int = time.ticks_us()
+        self.last_at: int = self.started_at
+        self.stages: list = []
+        self.reported: int = 0
+
+    def stage(self, name: str) -> None:
+        now = time.ticks_us()
+        elapsed_us = time.ticks_diff(now, self.last_at)
+        gc.collect()
+        heap = gc.mem_alloc() if hasattr(gc, "mem_alloc") else 0
+        self.stages.append((name, elapsed_us, heap))
+        self.last_at = time.ticks_us()
+
+    def total_us(self) -> int:
+        return sum(stage[1] for stage in self.stages)
+
+    def report(self) -> None:
+        previous = self.stages[self.reported - 1][2] if self.reported else 0
+        for name, elapsed_us, heap in self.stages[self.reported:]:
+            print("startup {:16s} {:7d}us heap {:6d} {:+6d}".format(
+                name, elapsed_us, heap, heap - previous))
+            previous = heap
+        self.reported = len(self.stages)
+        # ticks_us counts from reset, so this includes the firmware's own boot
+        print("startup {} stages {}us, {}us since reset".format(
+            len(self.stages), self.total_us(), self.last_at))
+
+
+# shared by the loader and the app, so the report covers the whole boot
+profile = StartupProfile()